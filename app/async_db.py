@@ -0,0 +1,37 @@
+import aiomysql
+from contextlib import asynccontextmanager
+from db import DB_CONFIG, DB_POOL_SIZE, DB_POOL_RECYCLE
+
+# Process-wide aiomysql pool used by the FastAPI endpoints
+_pool = None
+
+async def open_pool():
+    """Create the async connection pool, called once at server startup"""
+    global _pool
+    _pool = await aiomysql.create_pool(
+        host=DB_CONFIG['host'],
+        port=int(DB_CONFIG['port'] or 3306),
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        db=DB_CONFIG['database'],
+        minsize=1,
+        maxsize=DB_POOL_SIZE,
+        pool_recycle=DB_POOL_RECYCLE,
+        autocommit=True,
+    )
+    print(f"Async MySQL connection pool created with up to {DB_POOL_SIZE} connections.")
+
+async def close_pool():
+    """Close every pooled connection, called at server shutdown"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+@asynccontextmanager
+async def acquire_cursor():
+    """Borrow a pooled connection and a cursor on it without blocking the event loop"""
+    async with _pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            yield cursor
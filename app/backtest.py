@@ -0,0 +1,428 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from stations import STATIONS, VEHICLE_TYPES
+from forecasters import ENGINES, ENGINE_CONFIG, load_engine_config
+from trainAndUpdatePred import (load_history, prepare_series, predict_next, get_db_connection, periods,
+                                USE_HISTORY_CACHE, CPU_COUNT, TRAIN_WORKERS)
+
+# Forecasts of every (configuration, series, origin) already evaluated, keyed by a hash of all their inputs
+BACKTEST_CACHE_DIR = os.getenv("BACKTEST_CACHE_DIR", "/app/data/backtest")
+
+# NeuralProphet configurations compared by --mode configs: name -> (constructor kwargs, fit kwargs).
+# "production" is the configuration trainAndUpdatePred.py fits; an engine name (e.g. "profile") can be compared too
+NP_CONFIGS = {
+    "production": ({"daily_seasonality": True, "learning_rate": 1.0}, {}),
+    "production-20-epochs": ({"daily_seasonality": True, "learning_rate": 1.0}, {"epochs": 20}),
+    "daily-weekly-10-epochs": ({"daily_seasonality": True, "weekly_seasonality": True, "yearly_seasonality": False,
+                                "learning_rate": 1.0}, {"epochs": 10}),
+}
+
+def holdout_splits(series, origins, horizon, step=None):
+    """
+    Yield (origin, train, test) for the last `origins` rolling origins, `step`
+    observations apart (default: horizon, i.e. non-overlapping windows), each
+    testing the `horizon` observations after the origin
+    """
+    step = step or horizon
+    for k in range(origins, 0, -1):
+        cut = len(series) - horizon - (k - 1) * step
+        if cut <= 0:
+            continue
+        yield k, series.iloc[:cut], series.iloc[cut:cut + horizon]
+
+def mae(forecast, test):
+    """MAE of a forecast against the held-out observations, matched step by step"""
+    predicted = np.array([entry["predicted_availability"] for entry in forecast[:len(test)]])
+    return float(np.abs(predicted - test['y'].to_numpy()[:len(predicted)]).mean())
+
+def step_errors(forecast, test):
+    """(absolute error, actual) per horizon step of a forecast against the held-out observations"""
+    predicted = np.array([entry["predicted_availability"] for entry in forecast[:len(test)]], dtype=float)
+    actual = test['y'].to_numpy(dtype=float)[:len(predicted)]
+    return np.abs(predicted - actual), actual
+
+def summarize(abs_errors, actuals):
+    """MAE and MAPE (%) of matched errors; MAPE skips steps where nothing was available"""
+    abs_errors = np.asarray(abs_errors, dtype=float)
+    actuals = np.asarray(actuals, dtype=float)
+    nonzero = actuals > 0
+    mape = float((abs_errors[nonzero] / actuals[nonzero]).mean() * 100) if nonzero.any() else float("nan")
+    return float(abs_errors.mean()) if len(abs_errors) else float("nan"), mape
+
+def backtest_neuralprophet(series, origins, horizon):
+    """MAE of the production NeuralProphet configuration on each holdout window of each series"""
+    from neuralprophet import NeuralProphet
+
+    errors = {}
+    for key, df in series.items():
+        for origin, train, test in holdout_splits(df, origins, horizon):
+            m = NeuralProphet(daily_seasonality=True, learning_rate=1.0)
+            m.fit(train, freq="15min")
+            errors.setdefault(key, []).append(mae(predict_next(m, train), test))
+    return errors
+
+def backtest_engine(engine_name, series, origins, horizon):
+    """MAE of an in-process engine on each holdout window, every series forecast in one call per origin"""
+    engine = ENGINES[engine_name](persist=False)
+    errors = {}
+    for k in range(origins, 0, -1):
+        windows = {key: split for key, df in series.items()
+                   for split in holdout_splits(df, origins, horizon) if split[0] == k}
+        forecasts = engine.forecast({key: train for key, (_, train, _) in windows.items()}, horizon)
+        for key, (_, _, test) in windows.items():
+            if key in forecasts:
+                errors.setdefault(key, []).append(mae(forecasts[key], test))
+    return errors
+
+def _fit_cache_path(cache_dir, config_name, model_kwargs, fit_kwargs, key, train, horizon):
+    """Cache file of one fit, changing whenever the configuration or the training window does"""
+    fingerprint = json.dumps([config_name, model_kwargs, fit_kwargs, *key, str(train['ds'].iloc[-1]), len(train),
+                              round(float(train['y'].sum()), 4), horizon], sort_keys=True)
+    return os.path.join(cache_dir, hashlib.sha1(fingerprint.encode()).hexdigest() + ".json")
+
+def _init_backtest_worker(torch_threads):
+    """Pool initializer: cap torch threads so the workers don't oversubscribe the CPU"""
+    import torch
+    torch.set_num_threads(torch_threads)
+
+def _fit_and_forecast(config_name, model_kwargs, fit_kwargs, key, train, horizon, cache_dir):
+    """Fit one configuration on one training window and forecast horizon steps. Returns (forecast, fit seconds, cached)"""
+    path = _fit_cache_path(cache_dir, config_name, model_kwargs, fit_kwargs, key, train, horizon) if cache_dir else None
+    if path and os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+        return cached["forecast"], cached["fit_seconds"], True
+
+    from neuralprophet import NeuralProphet
+
+    started = time.perf_counter()
+    m = NeuralProphet(**model_kwargs)
+    m.fit(train, freq="15min", **fit_kwargs)
+    fit_seconds = time.perf_counter() - started
+
+    future = m.make_future_dataframe(train, periods=horizon)
+    forecast = [{"timestamp": str(row.ds), "predicted_availability": round(float(row.yhat1), 2)}
+                for row in m.predict(future).tail(horizon).itertuples()]
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"forecast": forecast, "fit_seconds": fit_seconds}, f)
+        os.replace(path + ".tmp", path)
+    return forecast, fit_seconds, False
+
+def backtest_configs(configs, series, origins, horizon, step=None, workers=TRAIN_WORKERS, torch_threads=0,
+                     cache_dir=BACKTEST_CACHE_DIR):
+    """
+    Rolling-origin backtest of each configuration on each series. NeuralProphet fits
+    run on a process pool and are cached in cache_dir; engines forecast every series
+    in one call per origin. Returns {config: {"errors": {(key, origin): (abs errors, actuals)},
+    "fit_seconds": [...], "cached": n}}
+    """
+    windows = {(key, origin): (train, test) for key, df in series.items()
+               for origin, train, test in holdout_splits(df, origins, horizon, step)}
+    results = {name: {"errors": {}, "fit_seconds": [], "cached": 0} for name in configs}
+
+    for name in configs:
+        if name not in ENGINES:
+            continue
+        engine = ENGINES[name](persist=False)
+        for origin in sorted({origin for _, origin in windows}, reverse=True):
+            trains = {key: train for (key, o), (train, _) in windows.items() if o == origin}
+            started = time.perf_counter()
+            forecasts = engine.forecast(trains, horizon)
+            # One call forecasts every series, so charge each series an equal share
+            per_series = (time.perf_counter() - started) / max(len(trains), 1)
+            for key, forecast in forecasts.items():
+                results[name]["errors"][(key, origin)] = step_errors(forecast, windows[(key, origin)][1])
+                results[name]["fit_seconds"].append(per_series)
+
+    jobs = [(name, *configs[name], key, origin) for name in configs if name not in ENGINES for key, origin in windows]
+    if not jobs:
+        return results
+
+    workers = max(1, min(workers, len(jobs)))
+    torch_threads = torch_threads or max(1, CPU_COUNT // workers)
+    print(f"Running {len(jobs)} fits on {workers} worker(s) with {torch_threads} torch thread(s) each")
+
+    def record(name, key, origin, outcome):
+        forecast, fit_seconds, cached = outcome
+        results[name]["errors"][(key, origin)] = step_errors(forecast, windows[(key, origin)][1])
+        results[name]["fit_seconds"].append(fit_seconds)
+        results[name]["cached"] += cached
+
+    if workers == 1:
+        _init_backtest_worker(torch_threads)
+        for name, model_kwargs, fit_kwargs, key, origin in jobs:
+            record(name, key, origin, _fit_and_forecast(name, model_kwargs, fit_kwargs, key,
+                                                        windows[(key, origin)][0], horizon, cache_dir))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_backtest_worker, initargs=(torch_threads,)) as pool:
+        futures = {
+            pool.submit(_fit_and_forecast, name, model_kwargs, fit_kwargs, key, windows[(key, origin)][0], horizon, cache_dir):
+                (name, key, origin)
+            for name, model_kwargs, fit_kwargs, key, origin in jobs
+        }
+        for future in as_completed(futures):
+            name, key, origin = futures[future]
+            try:
+                record(name, key, origin, future.result())
+            except Exception as e:
+                print(f"Failed {name} for station: '{key[0]}', vehicle: {key[1]}, origin {origin}: {e}")
+    return results
+
+def report_configs(results, horizon):
+    """Print accuracy against fit time per configuration, then MAE per horizon step and per series"""
+    rows = []
+    for name, result in results.items():
+        if not result["errors"]:
+            continue
+        abs_errors = np.concatenate([e for e, _ in result["errors"].values()])
+        actuals = np.concatenate([a for _, a in result["errors"].values()])
+        rows.append((name, *summarize(abs_errors, actuals), float(np.mean(result["fit_seconds"])),
+                     len(result["fit_seconds"]), result["cached"]))
+
+    # A configuration is worth considering when no other one is both more accurate and cheaper
+    print(f"\n{'Configuration':<28} {'MAE':>8} {'MAPE %':>8} {'Fit s':>8} {'Fits':>6} {'Cached':>7}  Pareto")
+    for name, mae_, mape, fit_s, fits, cached in sorted(rows, key=lambda row: row[3]):
+        dominated = any(other[1] <= mae_ and other[3] <= fit_s and (other[1], other[3]) != (mae_, fit_s) for other in rows)
+        print(f"{name:<28} {mae_:>8.2f} {mape:>8.1f} {fit_s:>8.2f} {fits:>6} {cached:>7}  {'' if dominated else '*'}")
+
+    print(f"\nMAE per horizon step\n{'Configuration':<28} " + " ".join(f"{f'+{h}':>7}" for h in range(1, horizon + 1)))
+    for name, result in results.items():
+        by_step = [[e[h] for e, _ in result["errors"].values() if len(e) > h] for h in range(horizon)]
+        print(f"{name:<28} " + " ".join(f"{np.mean(step):>7.2f}" if step else f"{'-':>7}" for step in by_step))
+
+    names = [name for name, result in results.items() if result["errors"]]
+    print(f"\nMAE per series\n{'Station':<40} {'Vehicle':<28} " + " ".join(f"{name[:14]:>14}" for name in names))
+    keys = sorted({key for result in results.values() for key, _ in result["errors"]})
+    for key in keys:
+        cells = []
+        for name in names:
+            errors = [e for (k, _), (e, _) in results[name]["errors"].items() if k == key]
+            cells.append(f"{np.concatenate(errors).mean():>14.2f}" if errors else f"{'-':>14}")
+        print(f"{key[0]:<40} {key[1]:<28} " + " ".join(cells))
+    return rows
+
+def evaluate_stored(batches, forecasts, history):
+    """
+    Match every stored forecast row with the availability later observed at its timestamp.
+    Returns one row per matched forecast step: station, vehicle, horizon (15-minute steps after the slot the batch was issued in), abs_error, actual
+    """
+    rows = forecasts.merge(batches.rename(columns={'id': 'batch_id', 'timestamp': 'batch_timestamp'}),
+                           on='batch_id', suffixes=('', '_of_batch'))
+    if 'batch_timestamp_of_batch' in rows:
+        # Archived rows carry the time of the batch that wrote them, hot rows take their batch's
+        rows['batch_timestamp'] = rows['batch_timestamp'].fillna(rows.pop('batch_timestamp_of_batch'))
+    rows['timestamp'] = pd.to_datetime(rows['timestamp'])
+    # Steps from the snapshot slot the batch was forecast from, so archived hours mixing several batches score right
+    issued = pd.to_datetime(rows['batch_timestamp']).dt.floor('15min')
+    rows['horizon'] = np.ceil((rows['timestamp'] - issued) / pd.Timedelta('15min')).astype(int)
+
+    actuals = history.melt(id_vars=['timestamp', 'stationName'], var_name='vehicle_type', value_name='actual')
+    actuals['timestamp'] = pd.to_datetime(actuals['timestamp'])
+    matched = rows.merge(actuals, left_on=['station_name', 'vehicle_type', 'timestamp'],
+                         right_on=['stationName', 'vehicle_type', 'timestamp']).dropna(subset=['actual'])
+    matched['abs_error'] = (matched['predicted_availability'].astype(float) - matched['actual'].astype(float)).abs()
+    return matched[['station_name', 'vehicle_type', 'horizon', 'abs_error', 'actual']]
+
+def report_stored(matched):
+    """Print MAE/MAPE of the stored forecasts per horizon step and per series"""
+    if matched.empty:
+        print("No stored forecast matches an observed snapshot yet")
+        return
+
+    print(f"\n{'Horizon':<10} {'MAE':>8} {'MAPE %':>8} {'Points':>8}")
+    for horizon, group in matched.groupby('horizon'):
+        horizon_mae, horizon_mape = summarize(group['abs_error'], group['actual'])
+        print(f"{f'+{horizon}':<10} {horizon_mae:>8.2f} {horizon_mape:>8.1f} {len(group):>8}")
+
+    print(f"\n{'Station':<40} {'Vehicle':<28} {'MAE':>8} {'MAPE %':>8} {'Points':>8}")
+    for (station, vehicle), group in matched.groupby(['station_name', 'vehicle_type']):
+        station_mae, station_mape = summarize(group['abs_error'], group['actual'])
+        print(f"{station:<40} {vehicle:<28} {station_mae:>8.2f} {station_mape:>8.1f} {len(group):>8}")
+
+    overall_mae, overall_mape = summarize(matched['abs_error'], matched['actual'])
+    print(f"\nOverall: MAE {overall_mae:.2f}, MAPE {overall_mape:.1f}% over {len(matched)} forecast points")
+
+def load_fixture(sqlite_path=None, csv_dir=None):
+    """
+    Tables of an offline fixture (see benchmarks/make_fixture.py): station_availability,
+    and optionally forecast_batches, forecast and forecast_archive, from a SQLite file or a directory of CSVs
+    """
+    if sqlite_path:
+        with sqlite3.connect(sqlite_path) as connection:
+            names = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            return {name: pd.read_sql(f"SELECT * FROM {name}", connection) for name in names}
+    return {os.path.splitext(os.path.basename(path))[0]: pd.read_csv(path)
+            for path in glob.glob(os.path.join(csv_dir, "*.csv"))}
+
+def fixture_history(tables, stations, vehicle_types):
+    """The fixture's station_availability in the shape load_history returns"""
+    history = tables['station_availability']
+    history = history.loc[history['stationName'].isin(stations), ['timestamp', 'stationName', *vehicle_types]].copy()
+    history['timestamp'] = pd.to_datetime(history['timestamp'])
+    for vehicle_type in vehicle_types:
+        history[vehicle_type] = history[vehicle_type].astype(float)
+    print(f"Shape of history data: {history.shape}")
+    return history.sort_values('timestamp').reset_index(drop=True)
+
+def archived_batches(archive):
+    """
+    forecast_archive rows in the (batches, forecasts) shape of the hot tables: one pseudo-batch per
+    (station, vehicle type, batch hour), with negative ids so they never collide with forecast_batches.
+    The archive keeps the last forecast of every timestamp within the hour, so each row keeps the
+    batch_timestamp of the batch that wrote it, for evaluate_stored() to derive its horizon
+    """
+    archive = archive.assign(batch_timestamp=pd.to_datetime(archive['batch_timestamp']))
+    keys = ['station_name', 'vehicle_type', 'batch_hour']
+    archive['batch_id'] = -1 - archive.groupby(keys, sort=True).ngroup()
+    batches = (archive.groupby('batch_id', as_index=False)
+               .agg(station_name=('station_name', 'first'), vehicle_type=('vehicle_type', 'first'),
+                    timestamp=('batch_timestamp', 'max'))
+               .rename(columns={'batch_id': 'id'}))
+    return batches, archive[['batch_id', 'timestamp', 'predicted_availability', 'batch_timestamp']]
+
+def load_stored_forecasts(days, tables=None):
+    """
+    Forecast batches of the last `days` days and their rows, from the fixture or MySQL, including
+    the batches maintenance.py has moved into forecast_archive
+    """
+    if tables is not None:
+        batches = tables.get('forecast_batches', pd.DataFrame(columns=['id', 'station_name', 'vehicle_type', 'timestamp']))
+        forecasts = tables.get('forecast', pd.DataFrame(columns=['batch_id', 'timestamp', 'predicted_availability']))
+        if 'forecast_archive' in tables:
+            old_batches, old_forecasts = archived_batches(tables['forecast_archive'])
+            batches = pd.concat([batches, old_batches], ignore_index=True)
+            forecasts = pd.concat([forecasts, old_forecasts], ignore_index=True)
+        batches = batches.assign(timestamp=pd.to_datetime(batches['timestamp']))
+        since = batches['timestamp'].max() - pd.Timedelta(days=days)
+        batches = batches[batches['timestamp'] >= since]
+        return batches[['id', 'station_name', 'vehicle_type', 'timestamp']], forecasts[forecasts['batch_id'].isin(batches['id'])]
+
+    connection = get_db_connection()
+    since = (pd.Timestamp.now(tz="Asia/Kolkata").tz_localize(None) - pd.Timedelta(days=days)).to_pydatetime()
+    batches = pd.read_sql("SELECT id, station_name, vehicle_type, timestamp FROM forecast_batches WHERE timestamp >= %s",
+                          connection, params=[since])
+    forecasts = pd.read_sql("""
+        SELECT f.batch_id, f.timestamp, f.predicted_availability
+        FROM forecast f JOIN forecast_batches fb ON fb.id = f.batch_id
+        WHERE fb.timestamp >= %s
+    """, connection, params=[since])
+    # Whole hours, matching the cut-off of the hot batches to the hour
+    archive = pd.read_sql("""
+        SELECT station_name, vehicle_type, batch_hour, batch_timestamp, timestamp, predicted_availability
+        FROM forecast_archive WHERE batch_hour >= %s
+    """, connection, params=[since.replace(minute=0, second=0, microsecond=0)])
+    connection.close()
+
+    old_batches, old_forecasts = archived_batches(archive)
+    return pd.concat([batches, old_batches], ignore_index=True), pd.concat([forecasts, old_forecasts], ignore_index=True)
+
+def parse_args():
+    """Parse the series to backtest and how to report the result"""
+    parser = argparse.ArgumentParser(description="Backtest the forecasting engines and NeuralProphet configurations on the stored history")
+    parser.add_argument("--mode", choices=["engines", "configs", "stored"], default="engines",
+                        help="engines: pick an engine per series against NeuralProphet, configs: accuracy against fit time "
+                             "of NeuralProphet configurations, stored: score the stored forecast batches against what was observed")
+    parser.add_argument("--engine", choices=list(ENGINES), default="profile", help="Engine compared with NeuralProphet")
+    parser.add_argument("--config", action="append",
+                        help="Configuration compared in configs mode (repeatable, defaults to every NeuralProphet configuration and profile)")
+    parser.add_argument("--configs-file", help="JSON file of extra configurations: {name: {\"model\": {...}, \"fit\": {...}}}")
+    parser.add_argument("--station", type=str, action="append", help="Station name (repeatable, defaults to all stations)")
+    parser.add_argument("--vehicle", type=int, action="append", choices=[0, 1], help="Vehicle type (repeatable, defaults to both)")
+    parser.add_argument("--origins", type=int, default=4, help="Number of holdout windows per series")
+    parser.add_argument("--horizon", type=int, default=periods, help="Steps forecast from each origin")
+    parser.add_argument("--step", type=int, help="Observations between rolling origins in configs mode (default: horizon)")
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS, help="Number of fitting processes in configs mode")
+    parser.add_argument("--torch-threads", type=int, default=0, help="Torch threads per worker (0 splits the cores evenly)")
+    parser.add_argument("--no-fit-cache", action="store_true", help="Refit every window instead of reusing cached fits")
+    parser.add_argument("--days", type=float, default=7, help="Days of stored forecast batches scored in stored mode")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative MAE increase accepted to move a series to the engine")
+    parser.add_argument("--write-config", nargs="?", const=ENGINE_CONFIG, help="Write the recommended engines into this ENGINE_CONFIG file")
+    parser.add_argument("--json", help="Also write the configs or stored mode results to this JSON file")
+    parser.add_argument("--no-cache", action="store_true", help="Read the full history from MySQL instead of the local cache")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--sqlite", help="Run offline against this SQLite fixture instead of MySQL")
+    source.add_argument("--csv", help="Run offline against this directory of CSV fixture tables instead of MySQL")
+    return parser.parse_args()
+
+def run_engines(args, series):
+    engine_errors = backtest_engine(args.engine, series, args.origins, args.horizon)
+    prophet_errors = backtest_neuralprophet(series, args.origins, args.horizon)
+
+    config = load_engine_config(args.write_config) if args.write_config else {}
+    config.setdefault("stations", {})
+
+    print(f"\n{'Station':<50} {'Vehicle':<28} {args.engine + ' MAE':>12} {'NP MAE':>10}  Engine")
+    for key in series:
+        if key not in engine_errors or key not in prophet_errors:
+            continue
+        station, vehicle = key
+        engine_mae = float(np.mean(engine_errors[key]))
+        prophet_mae = float(np.mean(prophet_errors[key]))
+        recommended = args.engine if engine_mae <= prophet_mae * (1 + args.tolerance) else "neuralprophet"
+        print(f"{station:<50} {vehicle:<28} {engine_mae:>12.2f} {prophet_mae:>10.2f}  {recommended}")
+
+        selected = config["stations"].get(station)
+        if not isinstance(selected, dict):
+            selected = {v: selected for v in VEHICLE_TYPES.values()} if selected else {}
+        selected[vehicle] = recommended
+        config["stations"][station] = selected
+
+    if args.write_config:
+        with open(args.write_config, "w") as f:
+            json.dump(config, f, indent=2)
+        print(f"\nEngine selection written to {args.write_config}")
+
+def run_configs(args, series):
+    configs = dict(NP_CONFIGS)
+    if args.configs_file:
+        with open(args.configs_file) as f:
+            configs.update({name: (spec.get("model", {}), spec.get("fit", {})) for name, spec in json.load(f).items()})
+    selected = args.config or [*configs, "profile"]
+    unknown = [name for name in selected if name not in configs and name not in ENGINES]
+    if unknown:
+        raise SystemExit(f"Unknown configuration(s): {', '.join(unknown)} (known: {', '.join([*configs, *ENGINES])})")
+    configs = {name: configs.get(name) for name in selected}
+
+    results = backtest_configs(configs, series, args.origins, args.horizon, args.step, args.workers,
+                               args.torch_threads, None if args.no_fit_cache else BACKTEST_CACHE_DIR)
+    rows = report_configs(results, args.horizon)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([dict(zip(["config", "mae", "mape", "fit_seconds", "fits", "cached"], row)) for row in rows], f, indent=2)
+
+if __name__ == "__main__":
+    args = parse_args()
+    stations = args.station or STATIONS
+    vehicles = [VEHICLE_TYPES[v] for v in (args.vehicle or list(VEHICLE_TYPES))]
+    tables = load_fixture(args.sqlite, args.csv) if args.sqlite or args.csv else None
+
+    if tables is not None:
+        history = fixture_history(tables, stations, vehicles)
+    else:
+        history = load_history(stations, vehicles, USE_HISTORY_CACHE and not args.no_cache)
+
+    if args.mode == "stored":
+        batches, forecasts = load_stored_forecasts(args.days, tables)
+        batches = batches[batches['station_name'].isin(stations) & batches['vehicle_type'].isin(vehicles)]
+        matched = evaluate_stored(batches, forecasts, history)
+        report_stored(matched)
+        if args.json:
+            matched.to_json(args.json, orient="records", indent=2)
+    else:
+        series = {(station, vehicle): prepare_series(history, station, vehicle) for station in stations for vehicle in vehicles}
+        if args.mode == "configs":
+            run_configs(args, series)
+        else:
+            run_engines(args, series)
@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+from mysql.connector import pooling
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# MySQL database configuration
+DB_CONFIG = {
+    'host': os.getenv("DB_HOST"),
+    'user': os.getenv("DB_USER"),
+    'password': os.getenv("DB_PASSWORD"),
+    'database': os.getenv("DB_NAME"),
+    'port': os.getenv("DB_PORT")
+}
+
+# Connection pool settings
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))  # mysql-connector caps a pool at 32 connections
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # seconds before a pooled connection is reopened
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# mysql-connector raises as soon as the pool is empty, so requests queue here for a free connection instead
+_available = threading.BoundedSemaphore(DB_POOL_SIZE)
+
+# When each pooled connection was opened, by server connection id, for recycling; at most one entry per pooled connection
+_opened_at = {}
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="parking",
+                    pool_size=DB_POOL_SIZE,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+                print(f"MySQL connection pool created with {DB_POOL_SIZE} connections.")
+    return _pool
+
+def _checkout():
+    """Take a connection from the pool, reconnecting it when it is stale or past DB_POOL_RECYCLE"""
+    if not _available.acquire(timeout=DB_POOL_TIMEOUT):
+        raise pooling.PoolError(f"No pooled MySQL connection available after {DB_POOL_TIMEOUT}s")
+
+    conn = None
+    key = None
+    try:
+        conn = get_pool().get_connection()
+        key = conn.connection_id
+        # Health check, reconnects when the server dropped the connection
+        conn.ping(reconnect=True, attempts=2, delay=0.5)
+
+        # A reconnect gets a new server connection id, so the clock restarts with it and the old entry goes
+        if conn.connection_id != key:
+            _opened_at.pop(key, None)
+            key = conn.connection_id
+        if time.monotonic() - _opened_at.setdefault(key, time.monotonic()) > DB_POOL_RECYCLE:
+            _opened_at.pop(key, None)
+            conn.reconnect(attempts=2, delay=0.5)
+            key = conn.connection_id
+            _opened_at[key] = time.monotonic()
+        return conn
+    except Exception:
+        if conn is not None:
+            _opened_at.pop(key, None)
+            conn.close()
+        _available.release()
+        raise
+
+@contextmanager
+def pooled_connection():
+    """Borrow a pooled connection for the duration of a request and always hand it back"""
+    conn = _checkout()
+    try:
+        yield conn
+    finally:
+        # Returns the connection to the pool instead of closing it
+        conn.close()
+        _available.release()
+
+@contextmanager
+def pooled_cursor():
+    """Borrow a pooled connection and a cursor on it, closing both afterwards"""
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
@@ -0,0 +1,108 @@
+import argparse
+import mysql.connector
+from db import DB_CONFIG
+from ingest import NATURAL_KEYS
+from rollup import ROLLUP_TABLE, DOWNSAMPLED_TABLES, backfill
+import history_cache
+
+# Timestamps the collectors used to write at fetch time; upserts now write the start of the slot, in minutes
+SNAPSHOT_TRUNCATION = {
+    'availability': ('timestamp', 15),
+    'ticket_share': ('Timestamp', 60),
+    'passenger_hourly_data': ('Timestamp', 60),
+    'station_data': ('Timestamp', 60),
+}
+
+# MySQL error code of the duplicate-key warnings INSERT IGNORE raises for the dropped rows
+ER_DUP_ENTRY = 1062
+
+def table_columns(cursor, table):
+    cursor.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION",
+        (table,),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def dedupe_table(connection, table):
+    """
+    Copy a table into a twin carrying the natural-key UNIQUE KEY, keeping the first
+    row of every slot (by id, or by fetch time when the table has no id), then swap
+    the two atomically. The original is kept as <table>_predupe until it is dropped by hand
+    """
+    cursor = connection.cursor()
+    key_columns = NATURAL_KEYS[table]
+    timestamp_column, slot_minutes = SNAPSHOT_TRUNCATION[table]
+    columns = table_columns(cursor, table)
+    copied = [c for c in columns if c.lower() != 'id']
+
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_dedup")
+    cursor.execute(f"CREATE TABLE {table}_dedup LIKE {table}")
+    cursor.execute(f"ALTER TABLE {table}_dedup ADD UNIQUE KEY uq_{table}_natural "
+                   f"({', '.join(f'`{c}`' for c in key_columns)})")
+
+    # Snap each timestamp to its slot so retried runs a few seconds apart collapse into one row. The
+    # wall-clock arithmetic matches ingest.snapshot_timestamp whatever the session time zone
+    select = [
+        f"`{c}` - INTERVAL MINUTE(`{c}`) % {slot_minutes} MINUTE - INTERVAL SECOND(`{c}`) SECOND "
+        f"- INTERVAL MICROSECOND(`{c}`) MICROSECOND" if c == timestamp_column else f"`{c}`"
+        for c in copied
+    ]
+    order = "id" if len(copied) < len(columns) else ", ".join(f"`{c}`" for c in [timestamp_column] + copied)
+    cursor.execute(f"INSERT IGNORE INTO {table}_dedup ({', '.join(f'`{c}`' for c in copied)}) "
+                   f"SELECT {', '.join(select)} FROM {table} ORDER BY {order}")
+    kept = cursor.rowcount
+
+    # Every dropped duplicate raises one warning; anything beyond those is a value IGNORE converted or dropped
+    cursor.execute("SELECT @@warning_count")
+    warnings = cursor.fetchone()[0]
+    cursor.execute("SHOW WARNINGS LIMIT 20")
+    conversions = [row for row in cursor.fetchall() if row[1] != ER_DUP_ENTRY]
+    connection.commit()
+
+    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    total = cursor.fetchone()[0]
+    ignored = total - kept
+    if warnings > ignored:
+        print(f"{table}: {warnings - ignored} warning(s) besides the dropped duplicates, "
+              f"compare against {table}_predupe:")
+        for level, code, message in conversions[:5]:
+            print(f"  {level} {code}: {message}")
+
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_predupe")
+    cursor.execute(f"RENAME TABLE {table} TO {table}_predupe, {table}_dedup TO {table}")
+    cursor.close()
+
+    print(f"{table}: kept {kept} of {total} rows, ignored {ignored}, original kept as {table}_predupe")
+    return ignored
+
+def rebuild_rollups(connection):
+    """The rollup sums were built from the duplicated rows, so rebuild them from scratch"""
+    cursor = connection.cursor()
+    for table in [ROLLUP_TABLE] + [table for table, _, _ in DOWNSAMPLED_TABLES.values()]:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    connection.commit()
+    cursor.close()
+    backfill(connection)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove duplicate snapshots and add the natural-key unique indexes the upserts rely on")
+    parser.add_argument("--table", action="append", choices=list(NATURAL_KEYS),
+                        help="Table to deduplicate (repeatable, default: all ingested tables)")
+    parser.add_argument("--skip-rollup", action="store_true", help="Do not rebuild the station rollup tables afterwards")
+    args = parser.parse_args()
+
+    # Run with the collectors paused: rows written between the copy and the swap land in the backup table
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        tables = args.table or list(NATURAL_KEYS)
+        for table in tables:
+            dedupe_table(connection, table)
+        if 'availability' in tables and not args.skip_rollup:
+            rebuild_rollups(connection)
+        connection.close()
+        # Snapshots moved to their slot start; the training cache still holds the old timestamps
+        history_cache.clear()
+    except mysql.connector.Error as e:
+        print(f"MySQL Error during deduplication: {e}")
+        exit(1)
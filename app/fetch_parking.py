@@ -3,121 +3,99 @@ import os
 from datetime import datetime
 from zoneinfo import ZoneInfo
 import mysql.connector
-import pandas as pd
 from dotenv import load_dotenv
+from rollup import rollup_snapshot
+from ingest import make_session, fetch_json, snapshot_timestamp, upsert_rows
+import metrics
+from metrics import timed, COLLECTOR_SECONDS, COLLECTOR_ROWS, COLLECTOR_FAILURES
 
 load_dotenv()
 
-# MySQL setup
-mysql_db = mysql.connector.connect(
-    host=os.getenv("DB_HOST"),
-    user=os.getenv("DB_USER"),
-    password=os.getenv("DB_PASSWORD"),
-    database=os.getenv("DB_NAME"),
-    port=os.getenv("DB_PORT")
-)
-mysql_cursor = mysql_db.cursor()
+COLUMNS = [
+    'timestamp', 'stationName', 'parkingAreaName', 'twoWheelerCapacity',
+    'threeNFourWheelerCapacity', 'twoWheelerOccupied', 'threeNFourWheelerOccupied',
+    'twoWheelerAvailable', 'threeNFourWheelerAvailable'
+]
 
-API = os.getenv("PARKING_DATA_API")
-data = requests.get(API).json()
-df = pd.DataFrame(data)
+def parking_records(data, timestamp):
+    """Parking API response (a list of parking areas) -> one availability row per parking area"""
+    records = []
+    for doc in data:
+        try:
+            records.append((timestamp,) + tuple(doc[column] for column in COLUMNS[1:]))
+        except (KeyError, TypeError) as e:
+            print(f"Error processing parking area {doc.get('parkingAreaName', 'unknown') if isinstance(doc, dict) else doc}: {e}")
+    return records
 
-# IST time
-now_ist = datetime.now(ZoneInfo("Asia/Kolkata")).replace(microsecond=0).replace(tzinfo=None)
-print("IST time:", now_ist)
-df['timestamp'] = now_ist
+def collect_parking(session, mysql_db):
+    """Fetch one availability snapshot, upsert it and roll it up to station level. Returns (snapshot timestamp, rows written)"""
+    # IST time, truncated to the 15-minute snapshot slot so a re-run overwrites the same snapshot
+    now_ist = snapshot_timestamp(datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None), 15)
+    print("IST time:", now_ist)
 
-df = df[['timestamp','stationName', 'parkingAreaName', 'twoWheelerCapacity','threeNFourWheelerCapacity',
-      'twoWheelerOccupied', 'threeNFourWheelerOccupied','twoWheelerAvailable','threeNFourWheelerAvailable']]
+    try:
+        with timed(COLLECTOR_SECONDS, source="parking", phase="fetch"):
+            data = fetch_json(session, os.getenv("PARKING_DATA_API"))
+    except (requests.RequestException, ValueError):
+        COLLECTOR_FAILURES.labels("parking", "fetch").inc()
+        raise
 
-print(df[['timestamp','stationName']].drop_duplicates())
-records = df.to_dict(orient='records')
+    records = parking_records(data, now_ist)
+    if not records:
+        print("No records to insert")
+        return now_ist, 0
 
-insert_query = """
-INSERT INTO availability (
-    timestamp, stationName, parkingAreaName, twoWheelerCapacity,
-    threeNFourWheelerCapacity, twoWheelerOccupied, threeNFourWheelerOccupied,
-    twoWheelerAvailable, threeNFourWheelerAvailable
-) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-"""
+    print(f"{len({record[1] for record in records})} stations, {len(records)} parking areas")
 
-records_to_insert = []
+    # The raw rows and their station-level rollup commit together, so a snapshot is either
+    # fully visible to the rollup readers or missing and retried
+    phase = "insert"
+    cursor = mysql_db.cursor()
+    try:
+        with timed(COLLECTOR_SECONDS, source="parking", phase="insert"):
+            written, _ = upsert_rows(mysql_db, 'availability', COLUMNS, records, commit=False)
+        phase = "rollup"
+        with timed(COLLECTOR_SECONDS, source="parking", phase="rollup"):
+            rollup_snapshot(cursor, now_ist)
+            mysql_db.commit()
+    except mysql.connector.Error as e:
+        print(f"MySQL Error during {phase}, snapshot rolled back: {e}")
+        COLLECTOR_FAILURES.labels("parking", phase).inc()
+        mysql_db.rollback()
+        raise
+    finally:
+        cursor.close()
+    COLLECTOR_ROWS.labels("parking").inc(written)
+    return now_ist, written
 
-for doc in records:
+if __name__ == "__main__":
+    # MySQL setup
     try:
-        # Extract data from MongoDB document (skip _id field)
-        timestamp = doc.get('timestamp')
-        station_name = doc.get('stationName')
-        parking_area_name = doc.get('parkingAreaName')
-        two_wheeler_capacity = doc.get('twoWheelerCapacity')
-        three_four_wheeler_capacity = doc.get('threeNFourWheelerCapacity')
-        two_wheeler_occupied = doc.get('twoWheelerOccupied')
-        three_four_wheeler_occupied = doc.get('threeNFourWheelerOccupied')
-        two_wheeler_available = doc.get('twoWheelerAvailable')
-        three_four_wheeler_available = doc.get('threeNFourWheelerAvailable')
-        
-        # Handle timestamp conversion if needed
-        if isinstance(timestamp, str):
-            # If timestamp is string, parse it
-            try:
-                timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S')
-            except ValueError:
-                # Try alternative format if needed
-                print(f"Warning: Could not parse timestamp: {timestamp}")
-                timestamp = None
-        
-        # Prepare record for insertion
-        record = (
-            timestamp,
-            station_name,
-            parking_area_name,
-            two_wheeler_capacity,
-            three_four_wheeler_capacity,
-            two_wheeler_occupied,
-            three_four_wheeler_occupied,
-            two_wheeler_available,
-            three_four_wheeler_available
+        mysql_db = mysql.connector.connect(
+            host=os.getenv("DB_HOST"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+            port=os.getenv("DB_PORT")
         )
-        
-        records_to_insert.append(record)
-        
-    except Exception as e:
-        print(f"Error processing document {doc.get('_id', 'unknown')}: {e}")
-        failed_inserts += 1
+    except mysql.connector.Error as e:
+        print(f"MySQL connection error: {e}")
+        exit(1)
 
-# Bulk insert all records
-try:
-    if records_to_insert:
-        mysql_cursor.executemany(insert_query, records_to_insert)
-        mysql_db.commit()
-        print(f"Successfully inserted {len(records_to_insert)} records into MySQL")
-    else:
-        print("No records to insert")
-        
-except mysql.connector.Error as e:
-    print(f"MySQL Error during bulk insert: {e}")
-    mysql_db.rollback()
-    
-    # Try individual inserts if bulk insert fails
-    print("Attempting individual inserts...")
-    for i, record in enumerate(records_to_insert):
-        successful_inserts = 0
-        failed_inserts = 0
-        try:
-            mysql_cursor.execute(insert_query, record)
-            mysql_db.commit()
-            successful_inserts += 1
-        except mysql.connector.Error as individual_error:
-            print(f"Failed to insert record {i+1}: {individual_error}")
-            print(f"Record data: {record}")
-            failed_inserts += 1
-            mysql_db.rollback()
-        print(f"Successful inserts: {successful_inserts}, Failed inserts: {failed_inserts}")
-
-finally:
-    # Close the MySQL connection
-    if mysql_cursor:
-        mysql_cursor.close()
-    if mysql_db:
+    session = make_session()
+    try:
+        _, written = collect_parking(session, mysql_db)
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error fetching parking data: {e}")
+        written = 0
+    except mysql.connector.Error:
+        written = 0
+    finally:
+        # Close the MySQL connection
+        session.close()
         mysql_db.close()
-    print("MySQL connection closed.")
\ No newline at end of file
+        print("MySQL connection closed.")
+        metrics.write_textfile("fetch_parking")
+
+    if not written:
+        exit(1)
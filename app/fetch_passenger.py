@@ -1,48 +1,20 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 import os
 import mysql.connector
 from dateutil.parser import parse
+from ingest import make_session, fetch_json, snapshot_timestamp, upsert_rows
+import metrics
+from metrics import timed, COLLECTOR_SECONDS, COLLECTOR_ROWS, COLLECTOR_FAILURES
 
 load_dotenv()
 
-# MySQL setup
-try:
-    mysql_db = mysql.connector.connect(
-        host=os.getenv("DB_HOST"),
-        user=os.getenv("DB_USER"),
-        password=os.getenv("DB_PASSWORD"),
-        database=os.getenv("DB_NAME"),
-        port=os.getenv("DB_PORT")
-    )
-    cursor = mysql_db.cursor()
-    print("MySQL connection established successfully.")
-
-except mysql.connector.Error as e:
-    print(f"MySQL connection error: {e}")
-    exit(1)
-
-now = datetime.now()
-timestamp = datetime.now(ZoneInfo("Asia/Kolkata")).replace(microsecond=0).replace(tzinfo=None)
-
-# Fetching ticket share data from the API
-try:
-    url = os.getenv("TICKET_SHARE_API")
-    response = requests.get(url)
-    data = response.json()
-
-    insert_query = """
-    INSERT INTO ticket_share (
-        Timestamp, TotalTickets, SVC, NCMCcard, MobileQR, StaticQR, PaperQR, PaytmQR, WhatsAppQR,
-        PhonePeQR, TotalQrCount, PromotionalRideQR, Tripcard, TouristCard, Token, GroupCard,
-        TotalQR, Cards, TotalCards, RedBusQR, RapidoQR, JusPayQR, ONDCQR
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-    )
-    """
-    record = [
+def ticket_share_records(data, timestamp):
+    """Ticket share API response -> one ticket_share row"""
+    return [[
         timestamp,
         data.get('totalTickets'),
         data.get('noOfSVC'),
@@ -66,134 +38,118 @@ try:
         data.get('noOfRapidoQR'),
         data.get('noOfJusPayQR'),
         data.get('noOfONDCQR')
-    ]
-
-    cursor.execute(insert_query, record)
-    mysql_db.commit()
-    print("Ticket share data inserted successfully.")
-
-except mysql.connector.Error as e:
-    print(f"MySQL Error during ticket_share insert: {e}")
-    mysql_db.rollback()
-
-except Exception as e:
-    print(f"Error fetching/parsing ticket share data: {e}")
-
-
-# Fetching hourly passenger data from the API
-try:
-    url = os.getenv("HOURLY_DATA_API")
-    response = requests.get(url)
-    data = response.json()
-
-    insert_query = """
-    INSERT INTO passenger_hourly_data (
-        Timestamp, Hour, Total, StoreValueCard, Token, TripCard, TouristCard, GroupTicket,
-        NCMCCard, PaperQR, MobileQR, StaticQR, WhatsappQR, PaytmQR, PhonepeQR,
-        ONDCRedBusQR, ONDCRapidoQR, ONDCNammaYatriQR
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-    )
-    """
+    ]]
 
+def hourly_records(data, timestamp):
+    """Hourly passenger API response -> one passenger_hourly_data row per hour"""
     records = [[timestamp, parse(time)] for time in data.get('categories')]
     for doc in data.get('series'):
         for i in range(len(records)):
             records[i].append(doc.get('data')[i])
+    return records
 
-    # Bulk insert all records
-    if records:
-        cursor.executemany(insert_query, records)
-        mysql_db.commit()
-        print(f"Successfully inserted {len(records)} records into passenger_hourly_data table")
-    else:
-        print("No records to insert")
-
-except mysql.connector.Error as e:
-    print(f"MySQL Error during bulk insert: {e}")
-    mysql_db.rollback()
-    # Try individual inserts if bulk insert fails
-    print("Attempting individual inserts...")
-    successful_inserts = 0
-    failed_inserts = 0
-    for i, record in enumerate(records):
-        try:
-            cursor.execute(insert_query, record)
-            mysql_db.commit()
-            successful_inserts += 1
-        except mysql.connector.Error as individual_error:
-            print(f"Failed to insert record {i+1}: {individual_error}")
-            print(f"Record data: {record}")
-            failed_inserts += 1
-            mysql_db.rollback()
-    print(f"Successful inserts: {successful_inserts}, Failed inserts: {failed_inserts}")
-
-except Exception as e:
-    print(f"Error fetching/parsing hourly passenger data: {e}")
-
-# Fetching station data from the API
-try:
-    url = os.getenv("STATION_DATA_API")
-    response = requests.get(url)
-    data = response.json()
-
-    insert_query = """
-    INSERT INTO station_data (
-        Timestamp, Station, Line, Total, StoreValueCard, Token, TripCard, TouristCard, GroupTicket,
-        NCMCCard, PaperQR, MobileQR, StaticQR, WhatsappQR, PaytmQR, PhonepeQR,
-        ONDCRedBusQR, ONDCRapidoQR, ONDCNammaYatriQR
-    ) VALUES (
-        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-    )
-    """
-
+def station_records(data, timestamp):
+    """Station API response -> one station_data row per station of lines 1 and 2"""
     record1 = [[timestamp, station, 1] for station in data[0].get('categories')]
     record2 = [[timestamp, station, 2] for station in data[1].get('categories')]
 
     for doc in data[0].get('series'):
         for i in range(len(record1)):
             record1[i].append(doc.get('data')[i])
-    
+
     for doc in data[1].get('series'):
         for i in range(len(record2)):
             record2[i].append(doc.get('data')[i])
 
-    records = record1 + record2
-
-    # Bulk insert all records
-    if records:
-        cursor.executemany(insert_query, records)
-        mysql_db.commit()
-        print(f"Successfully inserted {len(records)} records into station_data table")
-    else:
-        print("No records to insert")
-
-except mysql.connector.Error as e:
-    print(f"MySQL Error during bulk insert: {e}")
-    mysql_db.rollback()
-    # Try individual inserts if bulk insert fails
-    print("Attempting individual inserts...")
-    successful_inserts = 0
-    failed_inserts = 0
-    for i, record in enumerate(records):
-        try:
-            cursor.execute(insert_query, record)
-            mysql_db.commit()
-            successful_inserts += 1
-        except mysql.connector.Error as individual_error:
-            print(f"Failed to insert record {i+1}: {individual_error}")
-            print(f"Record data: {record}")
-            failed_inserts += 1
-            mysql_db.rollback()
-    print(f"Successful inserts: {successful_inserts}, Failed inserts: {failed_inserts}")
-
-except Exception as e:
-    print(f"Error fetching/parsing hourly passenger data: {e}")
-
-finally:
-    # Close the MySQL connection
-    if cursor:
-        cursor.close()
-    if mysql_db:
+    return record1 + record2
+
+# (table, API env var, columns, response -> rows)
+SOURCES = [
+    ("ticket_share", "TICKET_SHARE_API", [
+        "Timestamp", "TotalTickets", "SVC", "NCMCcard", "MobileQR", "StaticQR", "PaperQR", "PaytmQR", "WhatsAppQR",
+        "PhonePeQR", "TotalQrCount", "PromotionalRideQR", "Tripcard", "TouristCard", "Token", "GroupCard",
+        "TotalQR", "Cards", "TotalCards", "RedBusQR", "RapidoQR", "JusPayQR", "ONDCQR"
+    ], ticket_share_records),
+    ("passenger_hourly_data", "HOURLY_DATA_API", [
+        "Timestamp", "Hour", "Total", "StoreValueCard", "Token", "TripCard", "TouristCard", "GroupTicket",
+        "NCMCCard", "PaperQR", "MobileQR", "StaticQR", "WhatsappQR", "PaytmQR", "PhonepeQR",
+        "ONDCRedBusQR", "ONDCRapidoQR", "ONDCNammaYatriQR"
+    ], hourly_records),
+    ("station_data", "STATION_DATA_API", [
+        "Timestamp", "Station", "Line", "Total", "StoreValueCard", "Token", "TripCard", "TouristCard", "GroupTicket",
+        "NCMCCard", "PaperQR", "MobileQR", "StaticQR", "WhatsappQR", "PaytmQR", "PhonepeQR",
+        "ONDCRedBusQR", "ONDCRapidoQR", "ONDCNammaYatriQR"
+    ], station_records),
+]
+
+def fetch_source(session, name, url):
+    """fetch_json, timed per source in the worker thread so the overlap does not blur the timings"""
+    with timed(COLLECTOR_SECONDS, source=name, phase="fetch"):
+        return fetch_json(session, url)
+
+def collect_passenger(session, mysql_db):
+    """Fetch the three passenger sources concurrently, upsert each independently and report per source"""
+    # One snapshot per hour: a re-run within the hour overwrites it
+    now = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None)
+    timestamp = snapshot_timestamp(now, 60)
+    report = {}
+
+    # The fetches overlap, so the job takes as long as the slowest source instead of the sum
+    with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+        futures = {name: pool.submit(fetch_source, session, name, os.getenv(api)) for name, api, _, _ in SOURCES}
+
+        for name, _, columns, build_records in SOURCES:
+            try:
+                data = futures[name].result()
+            except (requests.RequestException, ValueError) as e:
+                print(f"Error fetching {name} data: {e}")
+                COLLECTOR_FAILURES.labels(name, "fetch").inc()
+                report[name] = f"fetch failed: {e}"
+                continue
+
+            try:
+                records = build_records(data, timestamp)
+                with timed(COLLECTOR_SECONDS, source=name, phase="insert"):
+                    written, failed = upsert_rows(mysql_db, name, columns, records)
+                COLLECTOR_ROWS.labels(name).inc(written)
+                if failed:
+                    COLLECTOR_FAILURES.labels(name, "insert").inc()
+                report[name] = f"ok, {written}/{len(records)} rows" if not failed else f"partial, {failed}/{len(records)} rows failed"
+            except Exception as e:
+                print(f"Error parsing/inserting {name} data: {e}")
+                COLLECTOR_FAILURES.labels(name, "insert").inc()
+                mysql_db.rollback()
+                report[name] = f"insert failed: {e}"
+
+    for name, outcome in report.items():
+        print(f"{name}: {outcome}")
+    return report
+
+if __name__ == "__main__":
+    # MySQL setup
+    try:
+        mysql_db = mysql.connector.connect(
+            host=os.getenv("DB_HOST"),
+            user=os.getenv("DB_USER"),
+            password=os.getenv("DB_PASSWORD"),
+            database=os.getenv("DB_NAME"),
+            port=os.getenv("DB_PORT")
+        )
+        print("MySQL connection established successfully.")
+
+    except mysql.connector.Error as e:
+        print(f"MySQL connection error: {e}")
+        exit(1)
+
+    session = make_session(pool_maxsize=len(SOURCES))
+    try:
+        report = collect_passenger(session, mysql_db)
+    finally:
+        # Close the MySQL connection
+        session.close()
         mysql_db.close()
-    print("MySQL connection closed.")
\ No newline at end of file
+        print("MySQL connection closed.")
+        metrics.write_textfile("fetch_passenger")
+
+    if not any(outcome.startswith("ok") for outcome in report.values()):
+        exit(1)
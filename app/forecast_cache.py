@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from metrics import FORECAST_CACHE_LOOKUPS
+
+load_dotenv()
+
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", 512))  # (station, vehicle type) entries kept
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", 900))  # seconds an entry is served without a reload
+FORECAST_CACHE_POLL = float(os.getenv("FORECAST_CACHE_POLL", 5))  # seconds between checks for a new forecast batch
+
+class ForecastCache:
+    """
+    LRU cache of forecasts keyed by (station, vehicle type) with a TTL, emptied
+    whenever the version returned by the poll function (the latest forecast
+    batch id) changes, checked at most every poll_interval seconds
+    """
+
+    def __init__(self, maxsize=FORECAST_CACHE_SIZE, ttl=FORECAST_CACHE_TTL, poll_interval=FORECAST_CACHE_POLL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def validate(self, poll):
+        """Clear the cache when a new batch has landed since the last check"""
+        if time.monotonic() - self._checked_at < self.poll_interval:
+            return
+        async with self._lock:
+            # Another request may have polled while this one waited for the lock
+            if time.monotonic() - self._checked_at < self.poll_interval:
+                return
+            version = await poll()
+            if version != self._version:
+                if self._entries:
+                    print(f"Forecast cache invalidated: latest batch {self._version} -> {version}")
+                self._entries.clear()
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, key):
+        """Return the cached value, or None when it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            FORECAST_CACHE_LOOKUPS.labels(result="miss").inc()
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            FORECAST_CACHE_LOOKUPS.labels(result="expired").inc()
+            return None
+        self._entries.move_to_end(key)
+        FORECAST_CACHE_LOOKUPS.labels(result="hit").inc()
+        return value
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entry when full"""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._version = None
+        self._checked_at = float("-inf")
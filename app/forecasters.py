@@ -0,0 +1,207 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Engine used for every series unless ENGINE_CONFIG says otherwise
+DEFAULT_ENGINE = os.getenv("FORECAST_ENGINE", "neuralprophet")
+
+# JSON file mapping stations (optionally per vehicle type) to engines, e.g.
+# {"default": "neuralprophet", "stations": {"LIC": "profile", "Guindy": {"twoWheelerAvailable": "profile"}}}
+ENGINE_CONFIG = os.getenv("ENGINE_CONFIG", "/app/engines.json")
+
+# Profile engine settings
+PROFILE_WEEKS = int(os.getenv("PROFILE_WEEKS", 4))  # weeks of history averaged into the profile
+PROFILE_DECAY = float(os.getenv("PROFILE_DECAY", 0.8))  # per-step decay of the last observation's offset from the profile
+
+FREQ = pd.Timedelta("15min")
+SLOTS_PER_DAY = 96
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+
+class Forecaster:
+    """
+    A forecasting engine. forecast() receives every series assigned to the engine
+    at once, as {(station_name, vehicle_type): DataFrame with ds and y columns},
+    and returns {(station_name, vehicle_type): [{"timestamp", "predicted_availability"}, ...]}.
+    predict() is the predict-only variant, reusing whatever state the engine stored;
+    engines only store state when persist is set
+    """
+    name = None
+
+    def __init__(self, persist=True):
+        self.persist = persist
+
+    def forecast(self, series, periods):
+        raise NotImplementedError
+
+    def predict(self, series, periods):
+        return self.forecast(series, periods)
+
+class ProfileForecaster(Forecaster):
+    """
+    Pure NumPy engine forecasting all series in one vectorized pass: the average
+    of each 15-minute slot of the week over the last PROFILE_WEEKS weeks (falling
+    back to the time-of-day average, then the series mean), shifted by the last
+    observation's offset from its profile, decaying by PROFILE_DECAY per step
+    """
+    name = "profile"
+
+    def forecast(self, series, periods):
+        keys = [key for key, df in series.items() if not df.empty]
+        if not keys:
+            return {}
+
+        # Align every series on one 15-minute grid covering the profile window
+        floored = {key: series[key]['ds'].dt.floor(FREQ) for key in keys}
+        end = max(ds.max() for ds in floored.values())
+        start = max(min(ds.min() for ds in floored.values()), end - pd.Timedelta(weeks=PROFILE_WEEKS) + FREQ)
+        n_slots = int((end - start) / FREQ) + 1
+
+        values = np.full((len(keys), n_slots), np.nan)
+        for row, key in enumerate(keys):
+            in_window = (floored[key] >= start).to_numpy()
+            positions = ((floored[key][in_window] - start) / FREQ).to_numpy().astype(int)
+            values[row, positions] = series[key]['y'].to_numpy(dtype=float)[in_window]
+
+        # A series silent for the whole window has no last observation to forecast from
+        observed = ~np.isnan(values)
+        silent = ~observed.any(axis=1)
+        if silent.any():
+            for row in np.flatnonzero(silent):
+                print(f"Profile engine: no observations for {keys[row]} since {start}, skipped")
+            keys = [key for row, key in enumerate(keys) if not silent[row]]
+            values, observed = values[~silent], observed[~silent]
+            if not keys:
+                return {}
+
+        # Slot of the week / of the day of every grid column
+        first_slot = start.dayofweek * SLOTS_PER_DAY + (start.hour * 60 + start.minute) // 15
+        week_slot = (first_slot + np.arange(n_slots)) % SLOTS_PER_WEEK
+        day_slot = week_slot % SLOTS_PER_DAY
+
+        filled = np.where(observed, values, 0.0)
+        week_profile = _slot_mean(filled, observed, week_slot, SLOTS_PER_WEEK)
+        day_profile = _slot_mean(filled, observed, day_slot, SLOTS_PER_DAY)
+        series_mean = filled.sum(axis=1) / np.maximum(observed.sum(axis=1), 1)
+
+        # Profile over the week, falling back to time-of-day, then to the mean
+        profile = np.where(np.isnan(week_profile), np.tile(day_profile, 7), week_profile)
+        profile = np.where(np.isnan(profile), series_mean[:, None], profile)
+
+        # Offset of each series' last observation from its profile
+        last = n_slots - 1 - np.argmax(observed[:, ::-1], axis=1)
+        rows = np.arange(len(keys))
+        offset = values[rows, last] - profile[rows, week_slot[last]]
+
+        steps = np.arange(1, periods + 1)
+        future_slot = (week_slot[last][:, None] + steps[None, :]) % SLOTS_PER_WEEK
+        predicted = profile[rows[:, None], future_slot] + offset[:, None] * PROFILE_DECAY ** steps[None, :]
+        predicted = np.clip(predicted, 0, None)
+
+        result = {}
+        for row, key in enumerate(keys):
+            last_ts = start + int(last[row]) * FREQ
+            result[key] = [{
+                "timestamp": (last_ts + int(step) * FREQ).strftime('%Y-%m-%d %H:%M:%S'),
+                "predicted_availability": round(float(predicted[row, i]), 2)
+            } for i, step in enumerate(steps)]
+        return result
+
+class GlobalNeuralProphetForecaster(Forecaster):
+    """
+    One NeuralProphet model fitted across every assigned series, with each
+    (station, vehicle type) as a series ID: local trends, shared seasonality,
+    and every forecast produced by a single predict call
+    """
+    name = "global"
+    MODEL_KEY = ("global", "all")
+
+    @staticmethod
+    def _series_id(key):
+        return f"{key[0]}|{key[1]}"
+
+    def _panel(self, series):
+        """Stack the series into one frame with the ID column NeuralProphet uses for multiple series"""
+        frames = [df.assign(ID=self._series_id(key)) for key, df in series.items() if not df.empty]
+        return pd.concat(frames, ignore_index=True)
+
+    def _forecast_with(self, model, series, panel, periods):
+        future = model.make_future_dataframe(panel, periods=periods)
+        predicted = model.predict(future)
+
+        result = {}
+        for key in series:
+            tail = predicted[predicted['ID'] == self._series_id(key)].tail(periods)
+            if tail.empty:
+                continue
+            result[key] = [{
+                "timestamp": row.ds.strftime('%Y-%m-%d %H:%M:%S'),
+                "predicted_availability": round(float(row.yhat1), 2)
+            } for row in tail.itertuples()]
+        return result
+
+    def forecast(self, series, periods):
+        if all(df.empty for df in series.values()):
+            return {}
+        from neuralprophet import NeuralProphet
+        import model_store
+
+        panel = self._panel(series)
+        m = NeuralProphet(daily_seasonality=True, learning_rate=1.0,
+                          trend_global_local="local", season_global_local="global")
+        m.fit(panel, freq="15min")
+        print(f"Global model trained on {panel['ID'].nunique()} series, {len(panel)} observations")
+
+        if self.persist:
+            model_store.save_model(m, *self.MODEL_KEY, {"trained_until": str(panel['ds'].max()),
+                                                         "series": sorted(panel['ID'].unique())})
+        return self._forecast_with(m, series, panel, periods)
+
+    def predict(self, series, periods):
+        import model_store
+
+        m, meta = model_store.load_model(*self.MODEL_KEY)
+        if m is None:
+            raise RuntimeError("no stored global model, run a training pass first")
+
+        # Series the stored model was not trained on cannot be predicted
+        known = set(meta["series"])
+        series = {key: df for key, df in series.items() if self._series_id(key) in known and not df.empty}
+        if not series:
+            return {}
+        return self._forecast_with(m, series, self._panel(series), periods)
+
+def _slot_mean(filled, observed, slots, n_slots):
+    """Per-series mean of the observed values in each slot, NaN where a slot has no observations"""
+    sums = np.zeros((filled.shape[0], n_slots))
+    counts = np.zeros((filled.shape[0], n_slots))
+    np.add.at(sums.T, slots, filled.T)
+    np.add.at(counts.T, slots, observed.T.astype(float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+# Engines that forecast every assigned series in-process; "neuralprophet" runs per series on the training pool
+ENGINES = {
+    ProfileForecaster.name: ProfileForecaster,
+    GlobalNeuralProphetForecaster.name: GlobalNeuralProphetForecaster,
+}
+
+def load_engine_config(path=ENGINE_CONFIG):
+    """Read the per-station engine selection, an empty selection when the file does not exist"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def engine_for(station_name, vehicle_type, config, override=None):
+    """Engine name selected for a (station, vehicle type) series"""
+    if override:
+        return override
+    selected = config.get("stations", {}).get(station_name)
+    if isinstance(selected, dict):
+        selected = selected.get(vehicle_type)
+    return selected or config.get("default") or DEFAULT_ENGINE
@@ -0,0 +1,184 @@
+import fcntl
+import json
+import os
+import numpy as np
+import pandas as pd
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from stations import station_slug
+from rollup import ROLLUP_TABLE
+
+load_dotenv()
+
+# Local columnar snapshot of the station-level availability series, one memory-mapped .npy per station,
+# filled from the station_availability rollup
+CACHE_DIR = os.getenv("HISTORY_CACHE_DIR", "/app/data/history")
+META_FILE = "meta.json"
+CACHE_VERSION = 2  # 2: checksum replaced the raw row count
+
+COLUMNS = ['twoWheelerAvailable', 'threeNFourWheelerAvailable']
+DTYPE = np.dtype([('timestamp', 'datetime64[s]')] + [(column, 'f8') for column in COLUMNS])
+
+def _station_file(station_name):
+    """File name of a station's cached series"""
+    return f"{station_slug(station_name)}.npy"
+
+@contextmanager
+def _locked():
+    """Hold an exclusive lock on the cache directory while it is read and updated"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(os.path.join(CACHE_DIR, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _read_meta():
+    try:
+        with open(os.path.join(CACHE_DIR, META_FILE)) as f:
+            meta = json.load(f)
+        if meta.get("version") == CACHE_VERSION:
+            return meta
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"version": CACHE_VERSION, "stations": {}}
+
+def _write_meta(meta):
+    path = os.path.join(CACHE_DIR, META_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def _read_series(entry):
+    """Memory-map a station's cached series"""
+    return np.load(os.path.join(CACHE_DIR, entry["file"]), mmap_mode='r')
+
+def _write_series(entry, series):
+    path = os.path.join(CACHE_DIR, entry["file"])
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, series)
+    os.replace(path + ".tmp", path)
+
+def clear():
+    """Drop every cached series so the next load refetches the full history"""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    with _locked():
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".npy") or name == META_FILE:
+                os.remove(os.path.join(CACHE_DIR, name))
+    print("History cache cleared")
+
+def _checksums(cursor, stations, meta):
+    """
+    Row count, value sums and timestamp sum of each cached station's rollup rows up to its high-water
+    mark: upserts that overwrite values, or re-slotted timestamps, change them without changing the count
+    """
+    by_high_water = {}
+    for station_name in stations:
+        entry = meta["stations"].get(station_name)
+        if entry:
+            by_high_water.setdefault(entry["high_water"], []).append(station_name)
+
+    sums = ", ".join(f"SUM(`{column}`)" for column in COLUMNS)
+    checksums = {}
+    for high_water, names in by_high_water.items():
+        placeholders = ", ".join(["%s"] * len(names))
+        cursor.execute(f"""
+        SELECT stationName, SUM(parkingAreas), {sums}, SUM(TIMESTAMPDIFF(SECOND, '2000-01-01', timestamp))
+        FROM {ROLLUP_TABLE}
+        WHERE stationName IN ({placeholders}) AND timestamp <= %s
+        GROUP BY stationName
+        """, (*names, high_water))
+        for station_name, *values in cursor.fetchall():
+            checksums[station_name] = [int(value or 0) for value in values]
+    return checksums
+
+def _find_backfilled(cursor, stations, meta):
+    """Return the cached stations whose rows up to their high-water mark changed since they were cached"""
+    checksums = _checksums(cursor, stations, meta)
+    return {station_name for station_name in stations if station_name in meta["stations"]
+            and checksums.get(station_name) != meta["stations"][station_name]["checksum"]}
+
+def _fetch_delta(cursor, stations, high_water):
+    """Fetch the station-level sums for snapshots newer than high_water (all of them when None)"""
+    placeholders = ", ".join(["%s"] * len(stations))
+    columns = ", ".join(f"`{column}`" for column in COLUMNS)
+    query = f"""
+    SELECT stationName, timestamp, {columns}
+    FROM {ROLLUP_TABLE}
+    WHERE stationName IN ({placeholders})
+    """
+    params = list(stations)
+    if high_water is not None:
+        query += " AND timestamp > %s"
+        params.append(high_water)
+    query += " ORDER BY timestamp"
+
+    cursor.execute(query, params)
+    rows = {}
+    for station_name, timestamp, *values in cursor.fetchall():
+        rows.setdefault(station_name, []).append((timestamp, values))
+    return rows
+
+def load(connection, stations):
+    """
+    Return the station-level history for stations as a DataFrame, fetching only
+    snapshots newer than the cached high-water mark and refetching any station
+    whose older rows were backfilled since the last run
+    """
+    with _locked():
+        meta = _read_meta()
+        cursor = connection.cursor()
+
+        stale = _find_backfilled(cursor, stations, meta)
+        for station_name in stale:
+            print(f"History cache invalidated for {station_name}: rows were backfilled or rewritten")
+            del meta["stations"][station_name]
+
+        # Stations sharing a high-water mark (normally all of them) share one delta query
+        by_high_water = {}
+        for station_name in stations:
+            entry = meta["stations"].get(station_name)
+            by_high_water.setdefault(entry["high_water"] if entry else None, []).append(station_name)
+
+        fetched = 0
+        updated = []
+        for high_water, names in by_high_water.items():
+            for station_name, rows in _fetch_delta(cursor, names, high_water).items():
+                entry = meta["stations"].setdefault(
+                    station_name, {"file": _station_file(station_name), "high_water": None, "checksum": None})
+
+                delta = np.empty(len(rows), dtype=DTYPE)
+                delta['timestamp'] = [timestamp for timestamp, _ in rows]
+                for i, column in enumerate(COLUMNS):
+                    delta[column] = [float(values[i]) if values[i] is not None else np.nan for _, values in rows]
+
+                series = np.concatenate([_read_series(entry), delta]) if entry["high_water"] else delta
+                _write_series(entry, series)
+                entry["high_water"] = str(rows[-1][0])
+                updated.append(station_name)
+                fetched += len(rows)
+
+        for station_name, checksum in _checksums(cursor, updated, meta).items():
+            meta["stations"][station_name]["checksum"] = checksum
+
+        cursor.close()
+        _write_meta(meta)
+        print(f"History cache: fetched {fetched} new snapshots, {len(stale)} station(s) rebuilt")
+
+        frames = []
+        for station_name in stations:
+            entry = meta["stations"].get(station_name)
+            if not entry:
+                continue
+            frame = pd.DataFrame(np.asarray(_read_series(entry)))
+            frame.insert(1, 'stationName', station_name)
+            frames.append(frame)
+
+    if not frames:
+        return pd.DataFrame(columns=['timestamp', 'stationName'] + COLUMNS)
+    history = pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable')
+    history['timestamp'] = pd.to_datetime(history['timestamp'])
+    return history.reset_index(drop=True)
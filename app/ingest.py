@@ -0,0 +1,91 @@
+import os
+from datetime import timedelta
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", 500))  # rows per multi-row INSERT and per transaction
+
+# Upstream request settings
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", 20))  # seconds per attempt, connect and read
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", 3))
+FETCH_BACKOFF = float(os.getenv("FETCH_BACKOFF", 1))  # retries wait backoff * 2^(attempt - 1) seconds
+
+# Natural key of every ingested table; each has a matching UNIQUE KEY (see dedupe_migration.py)
+NATURAL_KEYS = {
+    'availability': ['timestamp', 'stationName', 'parkingAreaName'],
+    'ticket_share': ['Timestamp'],
+    'passenger_hourly_data': ['Timestamp', 'Hour'],
+    'station_data': ['Timestamp', 'Station', 'Line'],
+}
+
+def make_session(pool_maxsize=1):
+    """Keep-alive HTTP session retrying failed GETs with exponential backoff"""
+    retry = Retry(
+        total=FETCH_RETRIES,
+        backoff_factor=FETCH_BACKOFF,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_maxsize=pool_maxsize)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_json(session, url):
+    """GET a JSON document, raising on timeouts and HTTP errors once the retries are spent"""
+    response = session.get(url, timeout=FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+def snapshot_timestamp(now, minutes):
+    """
+    Truncate a fetch time to the start of its `minutes` slot, so a retried or
+    overlapping run lands on the same natural key instead of a few seconds apart
+    """
+    slot = timedelta(minutes=minutes)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + ((now - midnight) // slot) * slot
+
+def upsert_rows(connection, table, columns, rows, chunk_size=INGEST_CHUNK_SIZE, commit=True):
+    """
+    Write rows with batched multi-row INSERT ... ON DUPLICATE KEY UPDATE against
+    the table's natural key, one transaction per chunk, so re-running an ingest
+    overwrites instead of duplicating. Returns (rows written, rows in failed chunks).
+    With commit=False every chunk joins the caller's transaction and errors are
+    raised, leaving the commit or rollback to the caller
+    """
+    key_columns = NATURAL_KEYS[table]
+    update_columns = [c for c in columns if c not in key_columns] or key_columns[:1]
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    column_list = ", ".join(f"`{c}`" for c in columns)
+    updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in update_columns)
+
+    cursor = connection.cursor()
+    written = 0
+    failed = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        query = (f"INSERT INTO {table} ({column_list}) VALUES {', '.join([row_placeholder] * len(chunk))} "
+                 f"ON DUPLICATE KEY UPDATE {updates}")
+        try:
+            cursor.execute(query, [value for row in chunk for value in row])
+            if commit:
+                connection.commit()
+            written += len(chunk)
+        except mysql.connector.Error as e:
+            print(f"MySQL Error upserting rows {start + 1}-{start + len(chunk)} into {table}: {e}")
+            if not commit:
+                cursor.close()
+                raise
+            connection.rollback()
+            failed += len(chunk)
+    cursor.close()
+
+    print(f"Upserted {written} rows into {table}" + (f", {failed} rows failed" if failed else ""))
+    return written, failed
@@ -0,0 +1,166 @@
+import argparse
+import os
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import requests
+import mysql.connector
+from dotenv import load_dotenv
+from db import pooled_connection
+from ingest import make_session, snapshot_timestamp
+from fetch_parking import collect_parking
+from fetch_passenger import SOURCES, collect_passenger
+from pipeline import ForecastPipeline
+import metrics
+
+load_dotenv()
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Schedule, in minutes of the IST clock. The passenger pull keeps the old cron slot (35 past the hour),
+# clear of the hourly training run at 5 past
+PARKING_INTERVAL = int(os.getenv("PARKING_INTERVAL", 15))
+PARKING_OFFSET = int(os.getenv("PARKING_OFFSET", 0))
+PASSENGER_INTERVAL = int(os.getenv("PASSENGER_INTERVAL", 60))
+PASSENGER_OFFSET = int(os.getenv("PASSENGER_OFFSET", 35))
+INGEST_JITTER = float(os.getenv("INGEST_JITTER", 20))  # max seconds added to each run, so ticks do not hit the APIs in lockstep
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", 60))  # seconds before a failed run is retried within its slot
+INGEST_METRICS_PORT = int(os.getenv("INGEST_METRICS_PORT", 9101))  # Also serves the batch jobs' textfiles; 0 writes its own textfile after each run instead
+
+def now_ist():
+    return datetime.now(IST).replace(tzinfo=None)
+
+class Job:
+    """
+    A collector run on a fixed slot of the IST clock (every `interval` minutes,
+    `offset` minutes past the slot), keeping its HTTP session open between runs
+    """
+
+    def __init__(self, name, interval, offset, collect, snapshot_minutes, last_collected_query,
+                 pool_maxsize=1, after=None):
+        self.name = name
+        self.interval = interval
+        self.offset = offset
+        self.collect = collect
+        self.snapshot_minutes = snapshot_minutes
+        self.last_collected_query = last_collected_query
+        self.after = after
+        self.session = make_session(pool_maxsize=pool_maxsize)
+        self.last_slot = None
+        self.failed = False
+        self.next_run = None
+
+    def slot(self, when):
+        """Start of the slot `when` falls in"""
+        offset = timedelta(minutes=self.offset)
+        return snapshot_timestamp(when - offset, self.interval) + offset
+
+    def schedule(self, now):
+        """Pick the next run time, catching up straight away when the current slot has not been collected"""
+        current = self.slot(now)
+        following = current + timedelta(minutes=self.interval)
+        if self.last_slot is not None and current <= self.last_slot:
+            self.next_run = following
+        elif self.failed:
+            self.next_run = min(now + timedelta(seconds=INGEST_RETRY_DELAY), following)
+        else:
+            if self.last_slot is not None:
+                missed = (current - self.last_slot) // timedelta(minutes=self.interval) - 1
+                if missed > 0:
+                    print(f"[{self.name}] {missed} slot(s) missed since {self.last_slot}, collecting the current one now")
+            self.next_run = now
+        self.next_run += timedelta(seconds=random.uniform(0, INGEST_JITTER))
+
+    def load_last_slot(self, connection):
+        """Find the newest stored snapshot, so a restart only collects when the current slot is missing"""
+        cursor = connection.cursor()
+        cursor.execute(self.last_collected_query)
+        (latest,) = cursor.fetchone()
+        cursor.close()
+        if latest is None:
+            return
+        # The collector stamps rows with the start of its snapshot slot, which can precede the job's own slot
+        current = self.slot(now_ist())
+        collected = latest >= snapshot_timestamp(current, self.snapshot_minutes)
+        self.last_slot = current if collected else self.slot(latest)
+
+    def run(self):
+        started = now_ist()
+        print(f"---- [{self.name}] run started at {started} ----")
+        self.failed = True
+        try:
+            with pooled_connection() as connection:
+                result = self.collect(self.session, connection)
+            self.failed = False
+            self.last_slot = self.slot(started)
+            if self.after:
+                self.after(result)
+        except (requests.RequestException, ValueError) as e:
+            print(f"[{self.name}] fetch failed: {e}")
+        except mysql.connector.Error as e:
+            print(f"[{self.name}] MySQL Error: {e}")
+        except Exception as e:
+            print(f"[{self.name}] failed: {e}")
+        print(f"---- [{self.name}] run finished in {(now_ist() - started).total_seconds():.1f}s ----")
+
+def build_jobs(pipeline=None):
+    def refresh_forecasts(result):
+        timestamp, written = result
+        if written:
+            pipeline.notify(timestamp)
+
+    return [
+        Job("parking", PARKING_INTERVAL, PARKING_OFFSET, collect_parking, 15,
+            "SELECT MAX(timestamp) FROM availability",
+            after=refresh_forecasts if pipeline else None),
+        Job("passenger", PASSENGER_INTERVAL, PASSENGER_OFFSET, collect_passenger, 60,
+            "SELECT MAX(Timestamp) FROM ticket_share", pool_maxsize=len(SOURCES)),
+    ]
+
+def serve(jobs):
+    """Run the jobs on their schedules until SIGTERM/SIGINT"""
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    try:
+        with pooled_connection() as connection:
+            for job in jobs:
+                job.load_last_slot(connection)
+    except mysql.connector.Error as e:
+        print(f"MySQL Error reading the last snapshots, collecting now: {e}")
+
+    now = now_ist()
+    for job in jobs:
+        job.schedule(now)
+        print(f"[{job.name}] every {job.interval} min at +{job.offset} min, next run at {job.next_run:%H:%M:%S}")
+
+    while not stop.is_set():
+        job = min(jobs, key=lambda j: j.next_run)
+        wait = (job.next_run - now_ist()).total_seconds()
+        # Jobs run one at a time; a job that overran its slot is picked up by schedule() as a missed run
+        if wait > 0 and stop.wait(wait):
+            break
+        job.run()
+        job.schedule(now_ist())
+        if not INGEST_METRICS_PORT:
+            metrics.write_textfile("ingest_daemon")
+
+    for job in jobs:
+        job.session.close()
+    print("Ingestion daemon stopped.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident scheduler running the parking and passenger collectors")
+    parser.add_argument("--no-predict", action="store_true", help="Do not refresh the forecasts after each parking snapshot")
+    args = parser.parse_args()
+
+    if INGEST_METRICS_PORT:
+        metrics.serve(INGEST_METRICS_PORT)
+    # Forecast refreshes run in their own process, so torch never loads into the daemon
+    pipeline = None if args.no_predict else ForecastPipeline()
+    serve(build_jobs(pipeline))
+    if pipeline:
+        pipeline.stop()
@@ -0,0 +1,118 @@
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+import mysql.connector
+from dotenv import load_dotenv
+from db import DB_CONFIG
+from migrations import PARTITION_MONTHS_AHEAD, is_partitioned, month_start, monthly_partitions
+
+load_dotenv()
+
+FORECAST_RETENTION_DAYS = float(os.getenv("FORECAST_RETENTION_DAYS", 2))  # days of forecast batches kept in the hot tables
+AVAILABILITY_RETENTION_MONTHS = int(os.getenv("AVAILABILITY_RETENTION_MONTHS", 0))  # 0 keeps every month, it is the training history
+MAINTENANCE_CHUNK_SIZE = int(os.getenv("MAINTENANCE_CHUNK_SIZE", 1000))  # batches deleted per transaction
+
+def monthly_partition_names(cursor, table):
+    cursor.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME LIKE 'p______' "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,),
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def ensure_partitions(connection, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Split the catch-all pmax partition of availability so the coming months each get their own partition"""
+    cursor = connection.cursor()
+    if not is_partitioned(cursor, 'availability'):
+        print("availability is not partitioned, run migrations.py first")
+        cursor.close()
+        return
+
+    names = monthly_partition_names(cursor, 'availability')
+    start = month_start(datetime.strptime(names[-1], "p%Y%m").date(), 1) if names else month_start(date.today())
+    partitions = monthly_partitions(start, month_start(date.today(), months_ahead))
+    if partitions:
+        cursor.execute("ALTER TABLE availability REORGANIZE PARTITION pmax INTO "
+                       f"({', '.join(partitions)}, PARTITION pmax VALUES LESS THAN (MAXVALUE))")
+        print(f"Added {len(partitions)} availability partition(s)")
+    cursor.close()
+
+def drop_old_partitions(connection, keep_months=AVAILABILITY_RETENTION_MONTHS):
+    """Drop whole months of availability older than keep_months, instead of deleting row by row"""
+    if keep_months <= 0:
+        return
+    cursor = connection.cursor()
+    oldest_kept = f"p{month_start(date.today(), -keep_months):%Y%m}"
+    expired = [name for name in monthly_partition_names(cursor, 'availability') if name < oldest_kept]
+    if expired:
+        cursor.execute(f"ALTER TABLE availability DROP PARTITION {', '.join(expired)}")
+        print(f"Dropped availability partition(s) {', '.join(expired)}")
+    cursor.close()
+
+# Keep the last batch of every hour of each pair: rows come in batch id order, so later batches overwrite earlier ones
+ARCHIVE_QUERY = """
+INSERT INTO forecast_archive (station_name, vehicle_type, batch_hour, batch_timestamp, timestamp, predicted_availability)
+SELECT fb.station_name, fb.vehicle_type, TIMESTAMP(DATE(fb.timestamp), MAKETIME(HOUR(fb.timestamp), 0, 0)),
+       fb.timestamp, f.timestamp, f.predicted_availability
+FROM forecast_batches fb
+JOIN forecast f ON f.batch_id = fb.id
+WHERE fb.id IN ({ids})
+ORDER BY fb.id
+ON DUPLICATE KEY UPDATE batch_timestamp = VALUES(batch_timestamp), predicted_availability = VALUES(predicted_availability)
+"""
+
+def compact_forecasts(connection, keep_days=FORECAST_RETENTION_DAYS, chunk_size=MAINTENANCE_CHUNK_SIZE, archive=True):
+    """
+    Move forecast batches older than keep_days out of the hot tables, one chunk per
+    transaction, down-sampling them into forecast_archive (unless archive is False).
+    Batches the latest_forecast_batch pointers still reference are kept whatever their age
+    """
+    # Batch timestamps are written in IST
+    cutoff = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None) - timedelta(days=keep_days)
+    cursor = connection.cursor()
+    compacted = 0
+    while True:
+        cursor.execute(
+            """
+            SELECT id FROM forecast_batches
+            WHERE timestamp < %s
+            AND id NOT IN (SELECT batch_id FROM latest_forecast_batch)
+            ORDER BY id
+            LIMIT %s
+            """,
+            (cutoff, chunk_size),
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        placeholders = ", ".join(["%s"] * len(ids))
+        if archive:
+            cursor.execute(ARCHIVE_QUERY.format(ids=placeholders), ids)
+        cursor.execute(f"DELETE FROM forecast WHERE batch_id IN ({placeholders})", ids)
+        cursor.execute(f"DELETE FROM forecast_batches WHERE id IN ({placeholders})", ids)
+        connection.commit()
+        compacted += len(ids)
+    cursor.close()
+    print(f"{'Archived' if archive else 'Deleted'} {compacted} forecast batches older than {cutoff:%Y-%m-%d %H:%M}")
+    return compacted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upkeep: availability partitions and forecast compaction")
+    parser.add_argument("--keep-days", type=float, default=FORECAST_RETENTION_DAYS, help="Days of forecast batches to keep in the hot tables")
+    parser.add_argument("--no-archive", action="store_true", help="Delete superseded batches instead of archiving them")
+    parser.add_argument("--forecasts-only", action="store_true", help="Only compact the forecast tables")
+    parser.add_argument("--keep-months", type=int, default=AVAILABILITY_RETENTION_MONTHS, help="Months of availability to keep (0 keeps all)")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        if not args.forecasts_only:
+            ensure_partitions(connection)
+            drop_old_partitions(connection, args.keep_months)
+        compact_forecasts(connection, args.keep_days, archive=not args.no_archive)
+        connection.close()
+    except mysql.connector.Error as e:
+        print(f"MySQL Error during maintenance: {e}")
+        exit(1)
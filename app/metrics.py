@@ -0,0 +1,143 @@
+import glob
+import os
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from prometheus_client import (REGISTRY, CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest,
+                               start_http_server, write_to_textfile)
+from prometheus_client.parser import text_string_to_metric_families
+
+load_dotenv()
+
+# Batch jobs write their metrics here as <job>.prom; the ingest daemon's /metrics serves them with a "batch" label.
+# Also readable by a node_exporter textfile collector; empty disables it
+METRICS_TEXTFILE_DIR = os.getenv("METRICS_TEXTFILE_DIR", "/app/data/metrics")
+
+# Buckets in seconds: requests and queries are milliseconds, fetches seconds, training phases minutes
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+FETCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+TRAINING_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 900, 1800)
+
+# API
+REQUEST_SECONDS = Histogram("parking_api_request_seconds", "Time to handle an API request",
+                            ["route", "method", "status"], buckets=FAST_BUCKETS)
+DB_QUERY_SECONDS = Histogram("parking_api_db_query_seconds", "Time to run an API query and fetch its rows",
+                             ["query"], buckets=FAST_BUCKETS)
+SERIALIZE_SECONDS = Histogram("parking_api_serialize_seconds", "Time to encode a response body",
+                              ["format"], buckets=FAST_BUCKETS)
+FORECAST_CACHE_LOOKUPS = Counter("parking_api_forecast_cache_lookups_total", "Forecast cache lookups", ["result"])
+
+# Training and forecasting
+TRAINING_PHASE_SECONDS = Histogram("parking_training_phase_seconds", "Time spent in each phase of a forecast job",
+                                   ["phase", "engine"], buckets=TRAINING_BUCKETS)
+TRAINING_RUN_SECONDS = Gauge("parking_training_run_duration_seconds", "Duration of the last run", ["mode"])
+TRAINING_LAST_SUCCESS = Gauge("parking_training_last_success_timestamp_seconds",
+                              "Unix time of the last run without failed jobs", ["mode"])
+TRAINING_JOBS = Counter("parking_training_jobs_total", "Forecast jobs by outcome", ["mode", "result"])
+FINETUNE_FALLBACKS = Counter("parking_training_finetune_fallbacks_total",
+                             "Warm starts that fell back to a full fit", ["reason"])
+
+# Collectors
+COLLECTOR_SECONDS = Histogram("parking_collector_seconds", "Time to fetch or write one collector source",
+                              ["source", "phase"], buckets=FETCH_BUCKETS)
+COLLECTOR_ROWS = Counter("parking_collector_rows_total", "Rows written by the collectors", ["source"])
+COLLECTOR_FAILURES = Counter("parking_collector_failures_total", "Failed collector fetches and writes", ["source", "phase"])
+
+# Metrics a pool worker can record and hand back to its parent
+_RECORDABLE = {
+    "request": REQUEST_SECONDS,
+    "db_query": DB_QUERY_SECONDS,
+    "serialize": SERIALIZE_SECONDS,
+    "training_phase": TRAINING_PHASE_SECONDS,
+    "collector": COLLECTOR_SECONDS,
+    "finetune_fallbacks": FINETUNE_FALLBACKS,
+}
+_NAMES = {id(metric): name for name, metric in _RECORDABLE.items()}
+
+# Observations of the current process, kept while recording() is active so pool workers can hand them back
+_recorded = None
+
+def _apply(metric, labels, value):
+    if isinstance(metric, Counter):
+        metric.labels(**labels).inc(value)
+    else:
+        metric.labels(**labels).observe(value)
+
+def observe(histogram, seconds, **labels):
+    _apply(histogram, labels, seconds)
+    if _recorded is not None:
+        _recorded.append((_NAMES[id(histogram)], labels, seconds))
+
+def count(counter, amount=1, **labels):
+    """Increment a counter, recorded like observe() for pool workers"""
+    observe(counter, amount, **labels)
+
+@contextmanager
+def timed(histogram, **labels):
+    """Observe the duration of the block, also when it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(histogram, time.perf_counter() - started, **labels)
+
+@contextmanager
+def recording():
+    """Collect this process's observations, e.g. in a pool worker whose registry is never scraped"""
+    global _recorded
+    _recorded = []
+    try:
+        yield _recorded
+    finally:
+        _recorded = None
+
+def replay(recorded):
+    """Observe what a worker recorded in this process's registry"""
+    for name, labels, value in recorded:
+        _apply(_RECORDABLE[name], labels, value)
+
+def latest():
+    """The registry in the Prometheus text format, with its content type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+class _WithTextfiles:
+    """The registry plus the textfiles of the batch jobs, merged per metric and labelled with the job.
+
+    Only metrics this module defines are taken over; the process and GC metrics of an exited job are not useful.
+    """
+
+    def __init__(self, registry, directory):
+        self.registry = registry
+        self.directory = directory
+
+    def collect(self):
+        families = {family.name: family for family in self.registry.collect()}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.prom"))):
+            batch = os.path.basename(path)[:-len(".prom")]
+            try:
+                with open(path) as f:
+                    parsed = list(text_string_to_metric_families(f.read()))
+            except (OSError, ValueError) as e:
+                print(f"Could not read metrics of {batch}: {e}")
+                continue
+            for family in parsed:
+                own = families.get(family.name)
+                if own is None or not family.name.startswith("parking_"):
+                    continue
+                own.samples += [sample._replace(labels={**sample.labels, "batch": batch}) for sample in family.samples]
+        return families.values()
+
+def serve(port):
+    """Expose /metrics of a long-running process that has no web server of its own, with the batch jobs' textfiles"""
+    start_http_server(port, registry=_WithTextfiles(REGISTRY, METRICS_TEXTFILE_DIR) if METRICS_TEXTFILE_DIR else REGISTRY)
+    print(f"Metrics served on port {port}")
+
+def write_textfile(job):
+    """Fallback for batch jobs: write the registry for the textfile collector, atomically"""
+    if not METRICS_TEXTFILE_DIR:
+        return
+    try:
+        os.makedirs(METRICS_TEXTFILE_DIR, exist_ok=True)
+        write_to_textfile(os.path.join(METRICS_TEXTFILE_DIR, f"{job}.prom"), REGISTRY)
+    except OSError as e:
+        print(f"Could not write metrics for {job}: {e}")
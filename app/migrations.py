@@ -0,0 +1,296 @@
+import argparse
+from datetime import date, datetime
+import mysql.connector
+from db import DB_CONFIG
+from rollup import ROLLUP_TABLE, CREATE_ROLLUP_TABLE, CREATE_DOWNSAMPLED_TABLES, DOWNSAMPLED_TABLES
+
+# Versioned schema changes, applied in order and recorded in schema_migrations.
+# Every step checks information_schema first, so it also brings an existing hand-made schema in line
+
+CREATE_MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS availability (
+        timestamp DATETIME NOT NULL,
+        stationName VARCHAR(255) NOT NULL,
+        parkingAreaName VARCHAR(255) NOT NULL,
+        twoWheelerCapacity INT,
+        threeNFourWheelerCapacity INT,
+        twoWheelerOccupied INT,
+        threeNFourWheelerOccupied INT,
+        twoWheelerAvailable INT,
+        threeNFourWheelerAvailable INT,
+        UNIQUE KEY uq_availability_natural (timestamp, stationName, parkingAreaName)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS forecast_batches (
+        id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        station_name VARCHAR(255) NOT NULL,
+        vehicle_type VARCHAR(64) NOT NULL,
+        timestamp DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS forecast (
+        batch_id INT NOT NULL,
+        timestamp DATETIME NOT NULL,
+        predicted_availability DOUBLE,
+        PRIMARY KEY (batch_id, timestamp)
+    )
+    """,
+    CREATE_ROLLUP_TABLE,
+    *CREATE_DOWNSAMPLED_TABLES,
+]
+
+# (table, index name, columns): each matches the WHERE and ORDER BY of a hot query, see EXPLAIN_CHECKS
+INDEXES = [
+    # /available at 15-minute resolution before the rollup, and per-station history reads
+    ('availability', 'idx_availability_station_time', ['stationName', 'timestamp']),
+    # Batches of one (station, vehicle type) in time order
+    ('forecast_batches', 'idx_forecast_batches_lookup', ['station_name', 'vehicle_type', 'timestamp']),
+    # Batches past retention, for the compaction job
+    ('forecast_batches', 'idx_forecast_batches_timestamp', ['timestamp']),
+    # Forecast rows of a batch in time order
+    ('forecast', 'idx_forecast_batch', ['batch_id', 'timestamp']),
+]
+
+PARTITION_MONTHS_AHEAD = 2  # empty monthly partitions kept ahead of the newest snapshot
+
+class MigrationError(Exception):
+    """Raised when a migration cannot be applied to the current schema"""
+
+def index_columns(cursor, table):
+    """Index name -> (columns in order, unique) of a table"""
+    cursor.execute(
+        "SELECT INDEX_NAME, COLUMN_NAME, NON_UNIQUE FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+        (table,),
+    )
+    indexes = {}
+    for name, column, non_unique in cursor.fetchall():
+        columns, _ = indexes.get(name, ([], not non_unique))
+        indexes[name] = (columns + [column], not non_unique)
+    return indexes
+
+def has_index_on(cursor, table, columns):
+    """True when some index of the table starts with these columns"""
+    prefix = [c.lower() for c in columns]
+    return any([c.lower() for c in cols[:len(prefix)]] == prefix for cols, _ in index_columns(cursor, table).values())
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+        (table,),
+    )
+    return cursor.fetchone()[0] > 0
+
+def month_start(day, months=0):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def monthly_partitions(first, last):
+    """PARTITION clauses for every month from first to last, each holding rows before the next month"""
+    month = month_start(first)
+    clauses = []
+    while month <= last:
+        following = month_start(month, 1)
+        clauses.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{following:%Y-%m-%d}')")
+        month = following
+    return clauses
+
+# Newest batch of every (station, vehicle type), swapped in by save_forecast_to_mysql()
+CREATE_LATEST_FORECAST_BATCH = """
+CREATE TABLE IF NOT EXISTS latest_forecast_batch (
+    station_name VARCHAR(255) NOT NULL,
+    vehicle_type VARCHAR(64) NOT NULL,
+    batch_id INT NOT NULL,
+    timestamp DATETIME NOT NULL,
+    PRIMARY KEY (station_name, vehicle_type)
+)
+"""
+
+# Superseded forecasts moved out of the hot tables by maintenance.py, the last batch of each hour
+CREATE_FORECAST_ARCHIVE = """
+CREATE TABLE IF NOT EXISTS forecast_archive (
+    station_name VARCHAR(255) NOT NULL,
+    vehicle_type VARCHAR(64) NOT NULL,
+    batch_hour DATETIME NOT NULL,
+    batch_timestamp DATETIME NOT NULL,
+    timestamp DATETIME NOT NULL,
+    predicted_availability DOUBLE,
+    PRIMARY KEY (station_name, vehicle_type, batch_hour, timestamp)
+)
+"""
+
+def create_tables(cursor):
+    for statement in CREATE_TABLES:
+        cursor.execute(statement)
+
+def add_indexes(cursor):
+    # The ingest upserts rely on the natural key, which cannot be added while duplicates remain
+    if not has_index_on(cursor, 'availability', ['timestamp', 'stationName', 'parkingAreaName']):
+        raise MigrationError("availability has no unique (timestamp, stationName, parkingAreaName) key, "
+                             "run dedupe_migration.py first")
+    for table, name, columns in INDEXES:
+        if has_index_on(cursor, table, columns):
+            continue
+        print(f"Adding {name} on {table} ({', '.join(columns)})")
+        cursor.execute(f"ALTER TABLE {table} ADD KEY {name} ({', '.join(f'`{c}`' for c in columns)})")
+
+def partition_availability(cursor):
+    """
+    Partition availability by month of timestamp, so range scans and the retention job
+    only touch the months they need. MySQL requires every unique key, the primary key
+    included, to contain the partitioning column, so keys without it are extended first.
+    Rebuilds the table: run it in a quiet window with the ingestion daemon stopped
+    """
+    if is_partitioned(cursor, 'availability'):
+        return
+
+    for name, (columns, unique) in index_columns(cursor, 'availability').items():
+        if not unique or 'timestamp' in [c.lower() for c in columns]:
+            continue
+        new_columns = ", ".join(f"`{c}`" for c in columns + ['timestamp'])
+        print(f"Extending unique key {name} of availability with timestamp")
+        if name == 'PRIMARY':
+            cursor.execute(f"ALTER TABLE availability DROP PRIMARY KEY, ADD PRIMARY KEY ({new_columns})")
+        else:
+            cursor.execute(f"ALTER TABLE availability DROP INDEX `{name}`, ADD UNIQUE KEY `{name}` ({new_columns})")
+
+    cursor.execute("SELECT MIN(timestamp) FROM availability")
+    first = cursor.fetchone()[0] or datetime.now()
+    last = month_start(date.today(), PARTITION_MONTHS_AHEAD)
+    partitions = monthly_partitions(first.date(), last) + ["PARTITION pmax VALUES LESS THAN (MAXVALUE)"]
+    print(f"Partitioning availability into {len(partitions)} partitions")
+    cursor.execute(f"ALTER TABLE availability PARTITION BY RANGE COLUMNS(timestamp) ({', '.join(partitions)})")
+
+def add_forecast_pointer(cursor):
+    """Create the latest batch pointer and the forecast archive, and point every pair at its newest existing batch"""
+    cursor.execute(CREATE_LATEST_FORECAST_BATCH)
+    cursor.execute(CREATE_FORECAST_ARCHIVE)
+    cursor.execute("""
+        INSERT INTO latest_forecast_batch (station_name, vehicle_type, batch_id, timestamp)
+        SELECT station_name, vehicle_type, id, timestamp
+        FROM (
+            SELECT id, station_name, vehicle_type, timestamp,
+                   ROW_NUMBER() OVER (PARTITION BY station_name, vehicle_type ORDER BY timestamp DESC, id DESC) AS rn
+            FROM forecast_batches
+        ) ranked
+        WHERE rn = 1
+        ON DUPLICATE KEY UPDATE batch_id = VALUES(batch_id), timestamp = VALUES(timestamp)
+    """)
+
+MIGRATIONS = [
+    (1, "Create the availability, forecast and rollup tables", create_tables),
+    (2, "Add composite indexes for the API, training and pipeline queries", add_indexes),
+    (3, "Partition availability by month", partition_availability),
+    (4, "Add the latest forecast batch pointer and the forecast archive", add_forecast_pointer),
+]
+
+def applied_versions(cursor):
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def migrate(connection, target=None):
+    """Apply the pending migrations up to target (default: all), recording each as it completes"""
+    cursor = connection.cursor()
+    applied = applied_versions(cursor)
+    for version, description, apply in MIGRATIONS:
+        if version in applied or (target is not None and version > target):
+            continue
+        print(f"Applying migration {version}: {description}")
+        # DDL commits implicitly in MySQL, so a failed migration is retried from its start on the next run
+        apply(cursor)
+        cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, NOW())",
+                       (version, description))
+        connection.commit()
+    cursor.close()
+
+# (name, query, params) for the hot read paths, mirroring server.py, trainAndUpdatePred.py and pipeline.py
+EXPLAIN_CHECKS = [
+    ("latest forecast of one station",
+     """SELECT f.timestamp, f.predicted_availability FROM latest_forecast_batch lb JOIN forecast f ON lb.batch_id = f.batch_id
+        WHERE lb.station_name = %s AND lb.vehicle_type = %s ORDER BY f.timestamp ASC LIMIT 6""",
+     ("Airport", "twoWheelerAvailable")),
+    ("latest forecast of each requested station",
+     """SELECT lb.station_name, lb.vehicle_type, f.timestamp, f.predicted_availability
+        FROM latest_forecast_batch lb JOIN forecast f ON f.batch_id = lb.batch_id
+        WHERE (station_name, vehicle_type) IN ((%s, %s), (%s, %s)) ORDER BY lb.station_name, lb.vehicle_type, f.timestamp""",
+     ("Airport", "twoWheelerAvailable", "Airport", "threeNFourWheelerAvailable")),
+    ("forecast batches past retention",
+     "SELECT id FROM forecast_batches WHERE timestamp < NOW() - INTERVAL 7 DAY ORDER BY id LIMIT 1000", ()),
+    ("station availability over a range",
+     """SELECT timestamp, twoWheelerAvailable FROM availability
+        WHERE stationName = %s AND timestamp >= CURDATE() - INTERVAL 7 DAY ORDER BY timestamp""",
+     ("Airport",)),
+    ("rollup of one snapshot",
+     """SELECT timestamp, stationName, SUM(twoWheelerAvailable), COUNT(*) FROM availability
+        WHERE timestamp >= %s AND timestamp < %s GROUP BY timestamp, stationName""",
+     (datetime(2026, 1, 1), datetime(2026, 1, 1, 0, 0, 1))),
+    ("/available at 15-minute resolution",
+     f"""SELECT stationName, timestamp, twoWheelerAvailable FROM {ROLLUP_TABLE}
+         WHERE stationName IN (%s) AND timestamp >= CURDATE() - INTERVAL 7 DAY ORDER BY stationName, timestamp""",
+     ("Airport",)),
+    ("/available from the hourly table",
+     f"""SELECT stationName, bucket, twoWheelerAvailableAvg FROM {DOWNSAMPLED_TABLES['hourly'][0]}
+         WHERE stationName IN (%s) AND bucket >= CURDATE() - INTERVAL 30 DAY ORDER BY stationName, bucket""",
+     ("Airport",)),
+]
+
+def explain_check(connection):
+    """EXPLAIN every hot query and report the ones reading a base table without an index. Returns the failures"""
+    cursor = connection.cursor(dictionary=True)
+    failures = []
+    for name, query, params in EXPLAIN_CHECKS:
+        cursor.execute("EXPLAIN " + query, params)
+        for row in cursor.fetchall():
+            table = row.get("table") or ""
+            # Derived tables and result sets are not stored, only base tables have to hit an index
+            if table.startswith("<"):
+                continue
+            ok = row.get("type") != "ALL" and row.get("key") is not None
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {table} type={row.get('type')} key={row.get('key')} rows={row.get('rows')}")
+            if not ok:
+                failures.append((name, table))
+    cursor.close()
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply the schema migrations and check the hot queries use indexes")
+    parser.add_argument("--target", type=int, help="Stop after this migration version")
+    parser.add_argument("--status", action="store_true", help="List the migrations and whether they are applied")
+    parser.add_argument("--explain", action="store_true", help="Only run the EXPLAIN check")
+    parser.add_argument("--no-explain", action="store_true", help="Only apply the migrations, e.g. at container start")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        if args.status:
+            cursor = connection.cursor()
+            applied = applied_versions(cursor)
+            cursor.close()
+            for version, description, _ in MIGRATIONS:
+                print(f"{version:>3} {'applied' if version in applied else 'pending'}  {description}")
+            failures = []
+        else:
+            if not args.explain:
+                migrate(connection, args.target)
+            failures = [] if args.no_explain else explain_check(connection)
+        connection.close()
+    except (mysql.connector.Error, MigrationError) as e:
+        print(f"Migration Error: {e}")
+        exit(1)
+
+    if failures:
+        print(f"{len(failures)} query plan(s) read a table without an index")
+        exit(1)
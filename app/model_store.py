@@ -0,0 +1,46 @@
+import json
+import os
+from dotenv import load_dotenv
+from stations import station_slug
+
+load_dotenv()
+
+# Fitted NeuralProphet checkpoints, one per (station, vehicle type), with a JSON sidecar of training metadata
+MODEL_DIR = os.getenv("MODEL_DIR", "/app/models")
+
+def _paths(station_name, vehicle_type):
+    """Checkpoint and metadata paths of a (station, vehicle type) model"""
+    base = os.path.join(MODEL_DIR, f"{station_slug(station_name)}__{vehicle_type}")
+    return base + ".np", base + ".json"
+
+def save_model(model, station_name, vehicle_type, meta):
+    """Persist a fitted model and its metadata, replacing any previous checkpoint atomically"""
+    from neuralprophet import save
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    model_path, meta_path = _paths(station_name, vehicle_type)
+
+    save(model, model_path + ".tmp")
+    os.replace(model_path + ".tmp", model_path)
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f, indent=2, default=str)
+    os.replace(meta_path + ".tmp", meta_path)
+
+def load_model(station_name, vehicle_type):
+    """Return (model, metadata) for a (station, vehicle type), or (None, None) when there is no usable checkpoint"""
+    import torch
+
+    model_path, meta_path = _paths(station_name, vehicle_type)
+    if not (os.path.exists(model_path) and os.path.exists(meta_path)):
+        return None, None
+
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # neuralprophet.load() fails on torch >= 2.6, which only unpickles weights by default; these are our own files
+        model = torch.load(model_path, weights_only=False)
+        model.restore_trainer()
+        return model, meta
+    except Exception as e:
+        print(f"Could not load checkpoint for {station_name} - {vehicle_type}: {e}")
+        return None, None
@@ -0,0 +1,172 @@
+import fcntl
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import mysql.connector
+from dotenv import load_dotenv
+from db import pooled_cursor
+from rollup import ROLLUP_TABLE
+from stations import STATIONS
+
+load_dotenv()
+
+# Lock held by every trainAndUpdatePred.py run, so hourly training and snapshot refreshes never overlap
+RUN_LOCK_PATH = os.getenv("RUN_LOCK_PATH", "/app/data/forecast.lock")
+LOCK_BUSY_EXIT = 75  # EX_TEMPFAIL, exit code of a run that gave up waiting for the lock
+
+PIPELINE_DEBOUNCE = float(os.getenv("PIPELINE_DEBOUNCE", 30))  # seconds of quiet before a burst of snapshots is refreshed
+PIPELINE_RETRY = float(os.getenv("PIPELINE_RETRY", 60))  # seconds before retrying a refresh blocked by training
+PIPELINE_MAX_SKIP = float(os.getenv("PIPELINE_MAX_SKIP", 60))  # minutes an unchanged station may keep its forecast
+
+PREDICT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "trainAndUpdatePred.py")
+PREDICT_LOG = os.getenv("PREDICT_LOG", "/var/log/training.log")
+
+class RunLockBusy(Exception):
+    """Raised when the run lock is still held after the timeout"""
+
+@contextmanager
+def run_lock(timeout=None, path=RUN_LOCK_PATH):
+    """Hold the forecast run lock, waiting up to timeout seconds for it (None waits forever, 0 not at all)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as lock_file:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise RunLockBusy(f"another forecast run holds {path}")
+                time.sleep(1)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Stations whose availability differs from the previous snapshot, or that are new in this one
+CHANGED_STATIONS_QUERY = f"""
+SELECT cur.stationName
+FROM {ROLLUP_TABLE} cur
+LEFT JOIN {ROLLUP_TABLE} prev ON prev.stationName = cur.stationName AND prev.timestamp = %s
+WHERE cur.timestamp = %s
+  AND (prev.stationName IS NULL
+       OR NOT (cur.twoWheelerAvailable <=> prev.twoWheelerAvailable)
+       OR NOT (cur.threeNFourWheelerAvailable <=> prev.threeNFourWheelerAvailable))
+"""
+
+def changed_stations(cursor, timestamp):
+    cursor.execute(f"SELECT MAX(timestamp) FROM {ROLLUP_TABLE} WHERE timestamp < %s", (timestamp,))
+    (previous,) = cursor.fetchone()
+    cursor.execute(CHANGED_STATIONS_QUERY, (previous, timestamp))
+    return {row[0] for row in cursor.fetchall()}
+
+def stale_stations(cursor, max_age_minutes, now):
+    """Stations without a forecast batch in the last max_age_minutes"""
+    cursor.execute("SELECT DISTINCT station_name FROM latest_forecast_batch WHERE timestamp >= %s",
+                   (now - timedelta(minutes=max_age_minutes),))
+    return set(STATIONS) - {row[0] for row in cursor.fetchall()}
+
+class ForecastPipeline:
+    """
+    Refreshes forecasts after each committed parking snapshot. Snapshots arriving
+    close together (catch-up runs, retries) are coalesced into one predict run,
+    and only stations whose availability changed, or whose forecast has aged past
+    PIPELINE_MAX_SKIP, are refreshed
+    """
+
+    def __init__(self, debounce=PIPELINE_DEBOUNCE, retry=PIPELINE_RETRY, max_skip=PIPELINE_MAX_SKIP, log_path=PREDICT_LOG):
+        self.debounce = debounce
+        self.retry = retry
+        self.max_skip = max_skip
+        self.log_path = log_path
+        self._snapshots = set()
+        self._stations = set()
+        self._last_notified = 0.0
+        self._wakeup = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name="forecast-pipeline", daemon=True)
+        self._thread.start()
+
+    def notify(self, timestamp):
+        """Queue a refresh for a snapshot the caller has committed"""
+        with self._wakeup:
+            self._snapshots.add(timestamp)
+            self._last_notified = time.monotonic()
+            self._wakeup.notify()
+
+    def stop(self):
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+        # A refresh in flight finishes in its own process
+        self._thread.join(timeout=5)
+
+    def _next_batch(self):
+        """Block until a burst of snapshots has gone quiet for debounce seconds, then take it"""
+        with self._wakeup:
+            while not self._stopped:
+                if not self._snapshots and not self._stations:
+                    self._wakeup.wait()
+                    continue
+                quiet = time.monotonic() - self._last_notified
+                if quiet < self.debounce:
+                    self._wakeup.wait(self.debounce - quiet)
+                    continue
+                snapshots, self._snapshots = self._snapshots, set()
+                stations, self._stations = self._stations, set()
+                return snapshots, stations
+            return None
+
+    def _affected_stations(self, snapshots):
+        now = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None)
+        with pooled_cursor() as cursor:
+            changed = set()
+            for timestamp in snapshots:
+                changed |= changed_stations(cursor, timestamp)
+            stale = stale_stations(cursor, self.max_skip, now)
+        affected = (changed & set(STATIONS)) | stale
+        print(f"Snapshot(s) {', '.join(f'{t:%H:%M}' for t in sorted(snapshots))}: {len(changed)} station(s) changed, "
+              f"{len(stale)} forecast(s) older than {self.max_skip:g} min, refreshing {len(affected)}/{len(STATIONS)}")
+        return affected
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            snapshots, stations = batch
+            try:
+                if snapshots:
+                    stations |= self._affected_stations(snapshots)
+                if stations and self._refresh(stations) == LOCK_BUSY_EXIT:
+                    print(f"Forecast run lock busy, retrying {len(stations)} station(s) in {self.retry:g}s")
+                    with self._wakeup:
+                        self._stations |= stations
+                        self._last_notified = time.monotonic() + self.retry - self.debounce
+            except (mysql.connector.Error, OSError) as e:
+                print(f"Forecast pipeline error: {e}")
+            except Exception as e:
+                # Keep the thread alive: stations skipped here are picked up again once their forecast ages out
+                print(f"Unexpected forecast pipeline error: {e!r}")
+
+    def _refresh(self, stations):
+        # Probe the lock first instead of starting an interpreter that exits at once while training runs
+        try:
+            with run_lock(0):
+                pass
+        except RunLockBusy:
+            return LOCK_BUSY_EXIT
+
+        command = [sys.executable, PREDICT_SCRIPT, "--mode", "predict", "--lock-timeout", "0"]
+        for station in sorted(stations):
+            command += ["--station", station]
+        started = time.monotonic()
+        with open(self.log_path, "a") as log:
+            returncode = subprocess.call(command, stdout=log, stderr=subprocess.STDOUT)
+        print(f"Forecast refresh of {len(stations)} station(s) exited with {returncode} after {time.monotonic() - started:.1f}s")
+        return returncode
@@ -0,0 +1,132 @@
+import argparse
+import mysql.connector
+from datetime import datetime, timedelta
+from db import DB_CONFIG
+
+# Station-level sums of the parking-area rows in availability, one row per station per snapshot
+ROLLUP_TABLE = "station_availability"
+
+CREATE_ROLLUP_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    timestamp DATETIME NOT NULL,
+    stationName VARCHAR(255) NOT NULL,
+    twoWheelerCapacity INT,
+    threeNFourWheelerCapacity INT,
+    twoWheelerOccupied INT,
+    threeNFourWheelerOccupied INT,
+    twoWheelerAvailable INT,
+    threeNFourWheelerAvailable INT,
+    parkingAreas INT NOT NULL,
+    PRIMARY KEY (stationName, timestamp),
+    KEY idx_{ROLLUP_TABLE}_timestamp (timestamp)
+)
+"""
+
+SUMMED_COLUMNS = [
+    'twoWheelerCapacity', 'threeNFourWheelerCapacity',
+    'twoWheelerOccupied', 'threeNFourWheelerOccupied',
+    'twoWheelerAvailable', 'threeNFourWheelerAvailable',
+]
+
+# parkingAreas counts the raw rows behind each sum, so readers can detect backfilled rows
+ROLLUP_QUERY = f"""
+INSERT INTO {ROLLUP_TABLE} (timestamp, stationName, {", ".join(SUMMED_COLUMNS)}, parkingAreas)
+SELECT timestamp, stationName, {", ".join(f"SUM({c})" for c in SUMMED_COLUMNS)}, COUNT(*)
+FROM availability
+WHERE timestamp >= %s AND timestamp < %s
+GROUP BY timestamp, stationName
+ON DUPLICATE KEY UPDATE {", ".join(f"{c} = VALUES({c})" for c in SUMMED_COLUMNS + ['parkingAreas'])}
+"""
+
+# Hourly and daily min/mean/max of the rollup, for long-range /available queries
+AVAILABLE_COLUMNS = ['twoWheelerAvailable', 'threeNFourWheelerAvailable']
+DOWNSAMPLED_TABLES = {
+    'hourly': (f"{ROLLUP_TABLE}_hourly", "TIMESTAMP(DATE(timestamp), MAKETIME(HOUR(timestamp), 0, 0))", timedelta(hours=1)),
+    'daily': (f"{ROLLUP_TABLE}_daily", "CAST(DATE(timestamp) AS DATETIME)", timedelta(days=1)),
+}
+
+def _create_downsampled_table(table):
+    stats = ",\n    ".join(f"{c}{stat} {sql_type}" for c in AVAILABLE_COLUMNS
+                          for stat, sql_type in (("Min", "INT"), ("Avg", "DOUBLE"), ("Max", "INT")))
+    return f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    bucket DATETIME NOT NULL,
+    stationName VARCHAR(255) NOT NULL,
+    {stats},
+    samples INT NOT NULL,
+    PRIMARY KEY (stationName, bucket),
+    KEY idx_{table}_bucket (bucket)
+)
+"""
+
+def _downsample_query(table, bucket):
+    stats = [f"{c}{stat}" for c in AVAILABLE_COLUMNS for stat in ("Min", "Avg", "Max")]
+    aggregates = ", ".join(f"{fn}({c})" for c in AVAILABLE_COLUMNS for fn in ("MIN", "AVG", "MAX"))
+    return f"""
+INSERT INTO {table} (bucket, stationName, {", ".join(stats)}, samples)
+SELECT {bucket} AS b, stationName, {aggregates}, COUNT(*)
+FROM {ROLLUP_TABLE}
+WHERE timestamp >= %s AND timestamp < %s
+GROUP BY b, stationName
+ON DUPLICATE KEY UPDATE {", ".join(f"{c} = VALUES({c})" for c in stats + ['samples'])}
+"""
+
+CREATE_DOWNSAMPLED_TABLES = [_create_downsampled_table(table) for table, _, _ in DOWNSAMPLED_TABLES.values()]
+DOWNSAMPLE_QUERIES = {name: _downsample_query(table, bucket) for name, (table, bucket, _) in DOWNSAMPLED_TABLES.items()}
+
+def _bucket_start(timestamp, name):
+    if name == 'daily':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def rollup_snapshot(cursor, timestamp):
+    """Aggregate one snapshot into the rollup table and refresh its hour and day buckets, in the caller's transaction"""
+    cursor.execute(ROLLUP_QUERY, (timestamp, timestamp + timedelta(seconds=1)))
+    rows = cursor.rowcount
+    for name, (_, _, width) in DOWNSAMPLED_TABLES.items():
+        start = _bucket_start(timestamp, name)
+        cursor.execute(DOWNSAMPLE_QUERIES[name], (start, start + width))
+    return rows
+
+def backfill(connection, since=None, days_per_chunk=1):
+    """Rebuild the rollup and its hourly/daily tables from availability one chunk at a time, committing after each chunk"""
+    cursor = connection.cursor()
+    for statement in [CREATE_ROLLUP_TABLE] + CREATE_DOWNSAMPLED_TABLES:
+        cursor.execute(statement)
+
+    cursor.execute("SELECT MIN(timestamp), MAX(timestamp) FROM availability")
+    first, last = cursor.fetchone()
+    if first is None:
+        print("No availability rows to backfill")
+        return
+
+    start = max(first, since) if since else first
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    while start <= last:
+        end = start + timedelta(days=days_per_chunk)
+        cursor.execute(ROLLUP_QUERY, (start, end))
+        # Chunks start at midnight and span whole days, so they cover whole hour and day buckets
+        for query in DOWNSAMPLE_QUERIES.values():
+            cursor.execute(query, (start, end))
+        connection.commit()
+        print(f"Backfilled {start:%Y-%m-%d} to {end:%Y-%m-%d}")
+        start = end
+    cursor.close()
+
+    # Imported here, history_cache reads from this module's table
+    import history_cache
+    history_cache.clear()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Backfill the {ROLLUP_TABLE} rollup and its hourly/daily tables from availability")
+    parser.add_argument("--since", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="Only rebuild snapshots from this date (YYYY-MM-DD), e.g. after backfilling availability")
+    args = parser.parse_args()
+
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        backfill(connection, args.since)
+        connection.close()
+    except mysql.connector.Error as e:
+        print(f"MySQL Error during rollup backfill: {e}")
+        exit(1)
@@ -1,10 +1,17 @@
+from typing import Literal
 from pydantic import BaseModel
 
 class ForecastRequest(BaseModel):
     station_name: str
     vehicle_type: int  # 0 for twoWheeler, 1 for threeNFourWheeler
 
+class BatchForecastRequest(BaseModel):
+    stations: list[ForecastRequest] = []
+    all_stations: bool = False  # Ignore stations and return every station's latest forecast
+
 class AvailabilityRequest(BaseModel):
     stations: list[ForecastRequest]
     days: int = 1  # Default to 1 day if not specified
+    resolution: Literal["auto", "15min", "hourly", "daily"] = "auto"  # auto picks by the number of days
+    format: Literal["rows", "columnar", "csv"] = "rows"  # columnar: parallel timestamps/available arrays per station
 
@@ -1,34 +1,26 @@
-import mysql.connector
+import aiomysql
 import os
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 import pandas as pd
 from typing import List
-from schemas import ForecastRequest, AvailabilityRequest
+from schemas import ForecastRequest, BatchForecastRequest, AvailabilityRequest
+from stations import VEHICLE_TYPES
+from rollup import ROLLUP_TABLE, DOWNSAMPLED_TABLES
+from async_db import open_pool, close_pool, acquire_cursor
+from forecast_cache import ForecastCache
+from migrations import MIGRATIONS
+from responses import FastJSONResponse, csv_response
+import metrics
 
 load_dotenv()
 PERIODS = int(os.getenv("PERIODS", 6))
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", 1000))  # bytes; smaller responses are not worth compressing
 
-# MySQL setup
-def get_mysql_connection():
-    try:
-        mysql_db = mysql.connector.connect(
-            host=os.getenv("DB_HOST"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASSWORD"),
-            database=os.getenv("DB_NAME"),
-            port=os.getenv("DB_PORT")
-        )
-        cursor = mysql_db.cursor()
-        print("MySQL connection established successfully.")
-        return mysql_db
-
-    except mysql.connector.Error as e:
-        print(f"MySQL connection error: {e}")
-        exit(1)
-
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 origins = os.getenv("CORS_ORIGINS", "*").split(",")
 
@@ -40,51 +32,149 @@ app.add_middleware(
     allow_headers=["*"],                # Allows all headers
 )
 
+# Compresses responses for clients sending Accept-Encoding: gzip
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Observe every request's handling time by route, so unknown paths share one label"""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.observe(metrics.REQUEST_SECONDS, time.perf_counter() - started,
+                        route=route.path if route else "unmatched", method=request.method, status=str(status))
+
+@app.on_event("startup")
+async def startup():
+    """Open the MySQL connection pool before the first request"""
+    await open_pool()
+    await check_schema()
+
+async def check_schema():
+    """Report pending migrations at startup: forecasts are read through latest_forecast_batch, created by migration 4"""
+    try:
+        async with acquire_cursor() as cursor:
+            await cursor.execute("SELECT version FROM schema_migrations")
+            applied = {row[0] for row in await cursor.fetchall()}
+    except aiomysql.Error as e:
+        print(f"Could not read schema_migrations: {e}")
+        applied = set()
+    pending = [f"{version} ({description})" for version, description, _ in MIGRATIONS if version not in applied]
+    if pending:
+        print(f"WARNING: pending schema migrations {', '.join(pending)}; run python migrations.py, "
+              "until then forecasts cannot be saved or served")
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_pool()
+
+# Forecasts only change when a new forecast batch is inserted
+forecast_cache = ForecastCache()
 
+async def get_latest_batch_id():
+    """Id of the newest forecast batch, the version of every cached forecast"""
+    with metrics.timed(metrics.DB_QUERY_SECONDS, query="latest_batch_id"):
+        async with acquire_cursor() as cursor:
+            await cursor.execute("SELECT MAX(id) FROM forecast_batches")
+            (batch_id,) = await cursor.fetchone()
+    return batch_id
 
-def get_latest_forecast(station_name, vehicle_type):
+async def get_latest_forecast(station_name, vehicle_type):
     """Retrieve the latest forecast for a station and vehicle type"""
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()     
+        await forecast_cache.validate(get_latest_batch_id)
+        cached = forecast_cache.get((station_name, vehicle_type))
+        if cached is not None:
+            return cached
+
+        # Primary-key read of the newest batch id, kept current by save_forecast_to_mysql()
         query = """
         SELECT f.timestamp as forecast_timestamp, 
                f.predicted_availability
-        FROM forecast_batches fb
-        JOIN forecast f ON fb.id = f.batch_id
-        WHERE fb.station_name = %s AND fb.vehicle_type = %s
-        ORDER BY fb.timestamp DESC, f.timestamp ASC
+        FROM latest_forecast_batch lb
+        JOIN forecast f ON lb.batch_id = f.batch_id
+        WHERE lb.station_name = %s AND lb.vehicle_type = %s
+        ORDER BY f.timestamp ASC
         LIMIT %s
         """
         
         # if limit:
         #     query += f" LIMIT {limit}"
         
-        cursor.execute(query, (station_name, vehicle_type, PERIODS))
-        predictions = cursor.fetchall()
+        with metrics.timed(metrics.DB_QUERY_SECONDS, query="latest_forecast"):
+            async with acquire_cursor() as cursor:
+                await cursor.execute(query, (station_name, vehicle_type, PERIODS))
+                predictions = await cursor.fetchall()
         result = []
 
         for timestamp, predicted_availability in predictions:
             result.append({"Timestamp": timestamp, "predicted_availability": predicted_availability})
 
+        forecast_cache.put((station_name, vehicle_type), result)
         return result
         
-    except mysql.connector.Error as e:
+    except aiomysql.Error as e:
         print(f"MySQL Error in get_latest_forecast: {e}")
         return None
 
+async def get_latest_forecasts(keys=None):
+    """
+    Retrieve the latest forecast of many (station, vehicle type) pairs, or of every
+    pair when keys is None, with one query through the latest batch pointers
+    """
+    if keys is not None:
+        if not keys:
+            return {}
+        pairs = ", ".join(["(%s, %s)"] * len(keys))
+        where = f"WHERE (station_name, vehicle_type) IN ({pairs})"
+        params = [value for key in keys for value in key]
+    else:
+        where, params = "", []
+
+    query = f"""
+    SELECT lb.station_name, lb.vehicle_type, f.timestamp, f.predicted_availability
+    FROM latest_forecast_batch lb
+    JOIN forecast f ON f.batch_id = lb.batch_id
+    {where}
+    ORDER BY lb.station_name, lb.vehicle_type, f.timestamp
+    """
+
+    with metrics.timed(metrics.DB_QUERY_SECONDS, query="latest_forecasts"):
+        async with acquire_cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+
+    # Station names compare like MySQL does: case-insensitively, ignoring trailing spaces
+    result = {} if keys is None else {key: [] for key in keys}
+    for station_name, vehicle_type, timestamp, predicted_availability in rows:
+        forecast = result.setdefault((station_name.lower().strip(), vehicle_type), [])
+        if len(forecast) < PERIODS:
+            forecast.append({"Timestamp": timestamp, "predicted_availability": predicted_availability})
+    return result
+
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Parking Forecast API"}
 
+@app.get("/metrics")
+async def read_metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = metrics.latest()
+    return Response(body, media_type=content_type)
+
 @app.post("/forecast")
-def forecast_parking(req: ForecastRequest):
+async def forecast_parking(req: ForecastRequest):
     """Retrieve the latest forecast for a specific station and vehicle type"""
     
     station_name = req.station_name.lower().strip()
     vehicle_type = 'twoWheelerAvailable' if int(req.vehicle_type) == 0 else 'threeNFourWheelerAvailable'
     print(f"Fetching forecast for station: {station_name}, vehicle type: {vehicle_type}")
-    data = get_latest_forecast(station_name, vehicle_type)
+    data = await get_latest_forecast(station_name, vehicle_type)
 
     if data:
         return {"forecast": data, "message": "forecast data for this station"}
@@ -92,54 +182,139 @@ def forecast_parking(req: ForecastRequest):
         return {"forecast": [], "message": "No forecast found for this station"}
 
 
+# Longest range (days) served at each resolution when the request asks for "auto"
+AUTO_RESOLUTION_DAYS = [(3, "15min"), (31, "hourly")]
+
+def pick_resolution(days, resolution):
+    """Resolve "auto" to the finest resolution that keeps the response small for the requested range"""
+    if resolution != "auto":
+        return resolution
+    for max_days, candidate in AUTO_RESOLUTION_DAYS:
+        if days <= max_days:
+            return candidate
+    return "daily"
+
 @app.post("/available")
-def get_availability(req: AvailabilityRequest):
+async def get_availability(req: AvailabilityRequest):
     """Retrieve availability for a list of stations and vehicle type for past N days"""
 
-    def helper(station_name, vehicle_type, days):
-        """Helper function to get availability for a single station and days"""
-    
-        station_name = station_name.lower().strip()
-        data_vehicle_type = 'Two Wheeler' if int(vehicle_type) == 0 else 'Three and Four Wheeler'
-        vehicle_type = 'twoWheelerAvailable' if int(vehicle_type) == 0 else 'threeNFourWheelerAvailable'
-        
-        query = f"""
-        SELECT timestamp, SUM(`{vehicle_type}`)
-        FROM availability
-        WHERE stationName = %s
-        AND DATE(timestamp) >= CURDATE() - INTERVAL %s DAY
-        GROUP BY timestamp
-        ORDER BY timestamp
-        """
-        cursor.execute(query, (station_name, days - 1))
-        result = cursor.fetchall()
-        
-        if result:
-            res = []
-            for x in result:
-                res.append({
-                    "timestamp": x[0],
-                    "available": x[1]
-                })
-            return {"station": station_name, "vehicle": data_vehicle_type, "availability": res}
-        else:
-            return {"station": station_name, "vehicle": data_vehicle_type, "availability": "No data found for this station"}
-
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
         stations = req.stations
         days = req.days
+        resolution = pick_resolution(days, req.resolution)
+        station_names = list(dict.fromkeys(entry.station_name.lower().strip() for entry in stations))
+        if not station_names:
+            return {"availability": [], "resolution": resolution, "message": "Availability data for the requested stations"}
+
+        # One query for every station and both vehicle types, from the rollup or its hourly/daily aggregates
+        placeholders = ", ".join(["%s"] * len(station_names))
+        if resolution == "15min":
+            query = f"""
+            SELECT stationName, timestamp, twoWheelerAvailable, threeNFourWheelerAvailable
+            FROM {ROLLUP_TABLE}
+            WHERE stationName IN ({placeholders})
+            AND timestamp >= CURDATE() - INTERVAL %s DAY
+            ORDER BY stationName, timestamp
+            """
+        else:
+            table = DOWNSAMPLED_TABLES[resolution][0]
+            query = f"""
+            SELECT stationName, bucket,
+                   twoWheelerAvailableAvg, twoWheelerAvailableMin, twoWheelerAvailableMax,
+                   threeNFourWheelerAvailableAvg, threeNFourWheelerAvailableMin, threeNFourWheelerAvailableMax
+            FROM {table}
+            WHERE stationName IN ({placeholders})
+            AND bucket >= CURDATE() - INTERVAL %s DAY
+            ORDER BY stationName, bucket
+            """
+        with metrics.timed(metrics.DB_QUERY_SECONDS, query=f"available_{resolution}"):
+            async with acquire_cursor() as cursor:
+                await cursor.execute(query, (*station_names, days - 1))
+                rows = await cursor.fetchall()
+
+        # Split the rows per station, matching names the way MySQL compared them
+        by_station = {}
+        for station_name, *row in rows:
+            by_station.setdefault(station_name.lower().strip(), []).append(row)
+
         res = []
+        csv_rows = []
         for entry in stations:
-            # Pass entry.days to helper
-            res.append(helper(entry.station_name, entry.vehicle_type, days))
-        
-        cursor.close()
-        conn.close()
-    
-        return {"availability": res, "message": "Availability data for the requested stations"}
-    
-    except mysql.connector.Error as e:
+            station_name = entry.station_name.lower().strip()
+            data_vehicle_type = 'Two Wheeler' if int(entry.vehicle_type) == 0 else 'Three and Four Wheeler'
+            vehicle = 0 if int(entry.vehicle_type) == 0 else 1
+
+            result = by_station.get(station_name)
+            if not result:
+                res.append({"station": station_name, "vehicle": data_vehicle_type, "availability": "No data found for this station"})
+                continue
+
+            # Mean over the bucket, with its min and max, for the hourly and daily resolutions
+            if resolution == "15min":
+                columns = {"available": [x[1 + vehicle] for x in result]}
+            else:
+                offset = 1 + 3 * vehicle
+                columns = {
+                    "available": [round(x[offset], 2) if x[offset] is not None else None for x in result],
+                    "min": [x[offset + 1] for x in result],
+                    "max": [x[offset + 2] for x in result],
+                }
+            timestamps = [x[0] for x in result]
+
+            if req.format == "csv":
+                csv_rows.extend(zip([station_name] * len(result), [data_vehicle_type] * len(result), timestamps, *columns.values()))
+            elif req.format == "columnar":
+                res.append({"station": station_name, "vehicle": data_vehicle_type, "timestamps": timestamps, **columns})
+            else:
+                names = ["timestamp", *columns]
+                availability = [dict(zip(names, values)) for values in zip(timestamps, *columns.values())]
+                res.append({"station": station_name, "vehicle": data_vehicle_type, "availability": availability})
+
+        if req.format == "csv":
+            header = ["station", "vehicle", "timestamp", "available"] + ([] if resolution == "15min" else ["min", "max"])
+            return csv_response(header, csv_rows, f"availability_{resolution}.csv")
+
+        # Returned directly so the rows skip FastAPI's jsonable_encoder pass
+        return FastJSONResponse({"availability": res, "resolution": resolution, "message": "Availability data for the requested stations"})
+
+    except aiomysql.Error as e:
         print(f"MySQL Error in get_availability: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+@app.post("/forecast/batch")
+async def forecast_parking_batch(req: BatchForecastRequest):
+    """Retrieve the latest forecast of many stations and vehicle types, or of every station, in one round trip"""
+
+    vehicle_codes = {column: code for code, column in VEHICLE_TYPES.items()}
+
+    try:
+        await forecast_cache.validate(get_latest_batch_id)
+
+        if req.all_stations:
+            forecasts = forecast_cache.get("all")
+            if forecasts is None:
+                forecasts = await get_latest_forecasts()
+                forecast_cache.put("all", forecasts)
+        else:
+            keys = list(dict.fromkeys(
+                (entry.station_name.lower().strip(), VEHICLE_TYPES[1 if int(entry.vehicle_type) else 0])
+                for entry in req.stations
+            ))
+            forecasts = {key: forecast_cache.get(key) for key in keys}
+            missing = [key for key, forecast in forecasts.items() if forecast is None]
+            if missing:
+                fetched = await get_latest_forecasts(missing)
+                for key, forecast in fetched.items():
+                    forecast_cache.put(key, forecast)
+                forecasts.update(fetched)
+
+    except aiomysql.Error as e:
+        print(f"MySQL Error in forecast_parking_batch: {e}")
+        return None
+
+    res = [
+        {"station_name": station_name, "vehicle_type": vehicle_codes.get(vehicle_type), "forecast": forecast}
+        for (station_name, vehicle_type), forecast in forecasts.items()
+    ]
+    return FastJSONResponse({"forecasts": res, "message": "forecast data for the requested stations"})
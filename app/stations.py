@@ -0,0 +1,55 @@
+import re
+
+# Stations trained every hour, in the order they are listed on the metro lines
+STATIONS = [
+    "Wimco Nagar Depot Metro",
+    "Wimco Nagar Metro",
+    "Thiruvotriyur Metro",
+    "Thiruvotriyur Theradi Metro",
+    "Kaladipet Metro",
+    "Tollgate Metro",
+    "New Washermenpet Metro",
+    "Tondiarpet Metro",
+    "Thiagaraya College Metro",
+    "Washermanpet",
+    "Mannadi",
+    "High Court",
+    "Government Estate",
+    "LIC",
+    "Thousand Lights",
+    "AG-DMS",
+    "Teynampet",
+    "Nandanam",
+    "Saidapet",
+    "Little Mount",
+    "Guindy",
+    "OTA - Nanganallur Road",
+    "Meenambakkam",
+    "Chennai International Airport",
+    "Puratchi Thalaivar Dr. M.G. Ramachandran Central",
+    "Egmore",
+    "Nehru Park",
+    "Kilpauk",
+    "Pachaiyappas College",
+    "Shenoy Nagar",
+    "Anna Nagar East",
+    "Anna Nagar Tower",
+    "Thirumangalam",
+    "Koyambedu",
+    "Arumbakkam",
+    "Vadapalani",
+    "Ashok Nagar",
+    "Ekkattuthangal",
+    "Arignar Anna Alandur ",
+    "St. Thomas Mount",
+]
+
+# 0 for twoWheeler, 1 for threeNFourWheeler
+VEHICLE_TYPES = {
+    0: 'twoWheelerAvailable',
+    1: 'threeNFourWheelerAvailable',
+}
+
+def station_slug(station_name):
+    """File-system safe name for a station, used by the on-disk caches"""
+    return re.sub(r'[^a-z0-9]+', '_', station_name.lower()).strip('_')
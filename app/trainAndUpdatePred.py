@@ -1,24 +1,42 @@
 import mysql.connector
 import pandas as pd
-from neuralprophet import NeuralProphet
 import os
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 import argparse
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from stations import STATIONS, VEHICLE_TYPES
+import history_cache
+import model_store
+from forecasters import ENGINES, load_engine_config, engine_for
+from pipeline import run_lock, RunLockBusy, LOCK_BUSY_EXIT
+import metrics
+from metrics import timed, TRAINING_PHASE_SECONDS, FINETUNE_FALLBACKS
 
 load_dotenv()
 
-# Argument parsing
-parser = argparse.ArgumentParser()
-parser.add_argument("--station", type=str, required=True, help="Station name")
-parser.add_argument("--vehicle", type=int, required=True, help="Vehicle type (0 for twoWheeler, 1 for threeNFourWheeler)", choices=[0, 1])
-args = parser.parse_args()
-
-station_name = args.station
-vehicle_type = 'twoWheelerAvailable' if args.vehicle == 0 else 'threeNFourWheelerAvailable'
 periods = int(os.getenv("PERIODS", 6))
 
+# Training pool configuration
+CPU_COUNT = os.cpu_count() or 1
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", CPU_COUNT))
+TRAIN_TORCH_THREADS = int(os.getenv("TRAIN_TORCH_THREADS", 0))  # 0 splits the cores evenly between workers
+TRAIN_JOB_TIMEOUT = int(os.getenv("TRAIN_JOB_TIMEOUT", 900))  # seconds, 0 disables the timeout
+
+# Warm-start: fine-tune the stored model on new observations, with a scheduled and a drift-triggered full refit
+WARM_START = os.getenv("WARM_START", "1") == "1"
+FINETUNE_EPOCHS = int(os.getenv("FINETUNE_EPOCHS", 5))
+FINETUNE_LEARNING_RATE = float(os.getenv("FINETUNE_LEARNING_RATE", 0.1))  # peak of the one-cycle schedule, below the full fit's 1.0
+FULL_REFIT_HOUR = int(os.getenv("FULL_REFIT_HOUR", 2))  # IST hour of the nightly full refit
+FULL_REFIT_MAX_AGE_HOURS = float(os.getenv("FULL_REFIT_MAX_AGE_HOURS", 24))
+DRIFT_FACTOR = float(os.getenv("DRIFT_FACTOR", 2.0))  # refit when MAE on new data exceeds this multiple of the fit MAE
+
+# Read the history through the local snapshot in history_cache.py instead of the full table
+USE_HISTORY_CACHE = os.getenv("HISTORY_CACHE", "1") == "1"
+
 # MySQL database configuration
 DB_CONFIG = {
     'host': os.getenv("DB_HOST"),
@@ -32,125 +50,248 @@ def get_db_connection():
     """Create and return a MySQL database connection"""
     return mysql.connector.connect(**DB_CONFIG)
 
-def train_model():
-    """Train the NeuralProphet model using data from MySQL availability table"""
+def load_history(stations, vehicle_types, use_cache=USE_HISTORY_CACHE):
+    """Load the station-level series for the requested stations once, aggregated in MySQL"""
     try:
         # Connect to MySQL
         connection = get_db_connection()
-        
-        # Query to fetch all availability data
-        query = """
-        SELECT timestamp, stationName, parkingAreaName, 
-               twoWheelerCapacity, threeNFourWheelerCapacity,
-               twoWheelerOccupied, threeNFourWheelerOccupied,
-               twoWheelerAvailable, threeNFourWheelerAvailable
-        FROM availability
+
+        if use_cache:
+            history = history_cache.load(connection, stations)
+            connection.close()
+            print(f"Shape of history data: {history.shape}")
+            return history[['timestamp', 'stationName', *vehicle_types]]
+
+        # Station-level sums from the rollup table, only for the columns we train on
+        columns = ", ".join(f"`{v}`" for v in vehicle_types)
+        placeholders = ", ".join(["%s"] * len(stations))
+        query = f"""
+        SELECT timestamp, stationName, {columns}
+        FROM station_availability
+        WHERE stationName IN ({placeholders})
         ORDER BY timestamp
         """
-        
+
         # Load data into pandas DataFrame
-        raw_df = pd.read_sql(query, connection)
+        history = pd.read_sql(query, connection, params=list(stations))
         connection.close()
-        
-        print(f"Shape of raw data: {raw_df.shape}")
-        
-        # Group by timestamp and stationName
-        grouped_df = raw_df.groupby(['timestamp', 'stationName']).agg({
-            'parkingAreaName': lambda x: list(x),
-            'twoWheelerCapacity': 'sum',
-            'threeNFourWheelerCapacity': 'sum',
-            'twoWheelerOccupied': 'sum',
-            'threeNFourWheelerOccupied': 'sum',
-            'twoWheelerAvailable': 'sum',
-            'threeNFourWheelerAvailable': 'sum'
-        }).reset_index()
-        
-        # Filter data for specific station
-        cutoff_ts = datetime.now()
-        df = grouped_df[grouped_df['stationName'] == station_name]
-        df = df.sort_values('timestamp')
-        
-        print(f"Shape of {station_name} data: {df.shape}")
-        
-        # Ensure timestamp is datetime
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-        
-        # Prepare data for Prophet (expects columns: ds (date), y (target))
-        df_prophet = df[df['timestamp'] <= cutoff_ts].reset_index()[['timestamp', vehicle_type]]
-        df_prophet.columns = ['ds', 'y']
-        df_prophet = df_prophet.dropna()
-        df_prophet = df_prophet[df_prophet['y'] >= 0]
-        
+
+        print(f"Shape of history data: {history.shape}")
+
+        # Ensure timestamp is datetime and the counts are floats
+        history['timestamp'] = pd.to_datetime(history['timestamp'])
+        for vehicle_type in vehicle_types:
+            history[vehicle_type] = history[vehicle_type].astype(float)
+        return history
+
+    except mysql.connector.Error as e:
+        print(f"MySQL Error in load_history: {e}")
+        raise
+
+def prepare_series(history, station_name, vehicle_type):
+    """Extract one station's series from the loaded history in the shape NeuralProphet expects"""
+    # Filter data for specific station. Stored timestamps are naive IST and the container clock is UTC
+    cutoff_ts = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None)
+    df = history.loc[history['stationName'] == station_name, ['timestamp', vehicle_type]]
+
+    print(f"Shape of {station_name} data: {df.shape}")
+
+    # Prepare data for Prophet (expects columns: ds (date), y (target))
+    df_prophet = df[df['timestamp'] <= cutoff_ts].reset_index(drop=True)
+    df_prophet.columns = ['ds', 'y']
+    df_prophet = df_prophet.dropna()
+    df_prophet = df_prophet[df_prophet['y'] >= 0]
+    return df_prophet
+
+def mean_absolute_error(model, df):
+    """MAE of a fitted model's predictions over the observations in df"""
+    predicted = model.predict(df)
+    return float((predicted['y'] - predicted['yhat1']).abs().mean())
+
+def full_refit_reason(meta, now_ist):
+    """Return why the stored model needs a full refit, or None when fine-tuning it is enough"""
+    if meta is None:
+        return "no checkpoint"
+    full_fit_at = datetime.fromisoformat(meta["full_fit_at"])
+    age_hours = (now_ist - full_fit_at).total_seconds() / 3600
+    if age_hours >= FULL_REFIT_MAX_AGE_HOURS:
+        return f"last full fit {age_hours:.0f}h ago"
+    if now_ist.hour == FULL_REFIT_HOUR and full_fit_at.date() != now_ist.date():
+        return "scheduled nightly refit"
+    return None
+
+def fine_tune(stored, df_prophet):
+    """
+    Fit a fresh model for FINETUNE_EPOCHS epochs, starting from the stored model's weights.
+    NeuralProphet cannot resume a fit (continue_training raises NotImplementedError as of 0.9),
+    and its normalization is refitted on every fit, so the whole series is trained on again;
+    only the number of epochs shrinks
+    """
+    from neuralprophet import NeuralProphet
+
+    m = NeuralProphet(daily_seasonality=True, learning_rate=FINETUNE_LEARNING_RATE, epochs=FINETUNE_EPOCHS)
+
+    # fit() builds the network through _init_model(); seed it with the stored weights. A changed
+    # network shape (e.g. weekly seasonality switching on) makes load_state_dict raise
+    init_model = m._init_model
+    def warm_model():
+        model = init_model()
+        model.load_state_dict(stored.model.state_dict())
+        return model
+
+    m._init_model = warm_model
+    try:
+        m.fit(df_prophet, freq="15min")
+    finally:
+        # The closure cannot be pickled by save_model()
+        del m._init_model
+    return m
+
+def train_model(history, station_name, vehicle_type, full_refit=False):
+    """Train the NeuralProphet model, fine-tuning the stored checkpoint when one is still fresh"""
+    try:
+        df_prophet = prepare_series(history, station_name, vehicle_type)
+        now_ist = datetime.now(ZoneInfo("Asia/Kolkata")).replace(microsecond=0).replace(tzinfo=None)
+
+        m, meta = model_store.load_model(station_name, vehicle_type) if WARM_START and not full_refit else (None, None)
+        reason = "forced" if full_refit else full_refit_reason(meta, now_ist)
+
+        if reason is None:
+            new_df = df_prophet[df_prophet['ds'] > pd.Timestamp(meta["trained_until"])]
+            if new_df.empty:
+                print(f"{station_name} - {vehicle_type} No new observations, reusing stored model")
+                return m, df_prophet
+
+            try:
+                mae = mean_absolute_error(m, new_df)
+                if mae > DRIFT_FACTOR * max(meta["baseline_mae"], 1.0):
+                    reason = f"drift (MAE {mae:.2f} vs {meta['baseline_mae']:.2f})"
+                    metrics.count(FINETUNE_FALLBACKS, reason="drift")
+                else:
+                    with timed(TRAINING_PHASE_SECONDS, phase="finetune", engine="neuralprophet"):
+                        m = fine_tune(m, df_prophet)
+                    meta["trained_until"] = str(df_prophet['ds'].max())
+                    meta["updated_at"] = str(now_ist)
+                    model_store.save_model(m, station_name, vehicle_type, meta)
+                    print(f"{station_name} - {vehicle_type} Model Fine-tuned, {len(new_df)} new observations")
+                    return m, df_prophet
+            except Exception as e:
+                print(f"WARNING: {station_name} - {vehicle_type} fine-tune failed, falling back to a full fit: {e!r}")
+                metrics.count(FINETUNE_FALLBACKS, reason="error")
+                reason = f"fine-tune failed: {e}"
+
+        print(f"{station_name} - {vehicle_type} Full fit ({reason})")
+
+        # Imported here so runs served only by the NumPy engines never load torch
+        from neuralprophet import NeuralProphet
+
         # Train the model
         m = NeuralProphet(daily_seasonality=True, learning_rate=1.0)
-        m.fit(df_prophet, freq="15min")
-        
+        with timed(TRAINING_PHASE_SECONDS, phase="fit", engine="neuralprophet"):
+            m.fit(df_prophet, freq="15min")
+
+        # In-sample error over the last day is the reference for drift detection
+        meta = {
+            "trained_until": str(df_prophet['ds'].max()),
+            "full_fit_at": str(now_ist),
+            "updated_at": str(now_ist),
+            "baseline_mae": mean_absolute_error(m, df_prophet.tail(96)),
+        }
+        model_store.save_model(m, station_name, vehicle_type, meta)
+
         print(f"{station_name} - {vehicle_type} Model Trained Successfully")
         return m, df_prophet
-        
-    except mysql.connector.Error as e:
-        print(f"MySQL Error in train_model: {e}")
-        raise
+
     except Exception as e:
         print(f"Error in train_model: {e}")
         raise
 
-def forecast_parking():
-    """Generate forecast and save to MySQL database"""
-    try:
-        # Train the model
-        model, history_df = train_model()
-        
+def predict_next(model, history_df):
+    """Predict the next `periods` steps after the last observation in history_df"""
+    with timed(TRAINING_PHASE_SECONDS, phase="predict", engine="neuralprophet"):
         # Generate future dataframe
         future = model.make_future_dataframe(history_df, periods=periods)
-        
+
         # Make predictions
         forecast = model.predict(future)
-        
-        # Get only the forecasted part
-        forecast_tail = forecast.tail(periods)
-        
-        # Prepare result data
-        result = []
-        for _, row in forecast_tail.iterrows():
-            result.append({
-                "timestamp": row['ds'].strftime('%Y-%m-%d %H:%M:%S'),
-                "predicted_availability": round(row['yhat1'], 2)
-            })
-        
+
+    # Get only the forecasted part
+    forecast_tail = forecast.tail(periods)
+
+    # Prepare result data
+    result = []
+    for _, row in forecast_tail.iterrows():
+        result.append({
+            "timestamp": row['ds'].strftime('%Y-%m-%d %H:%M:%S'),
+            "predicted_availability": round(row['yhat1'], 2)
+        })
+    return result
+
+def forecast_parking(history, station_name, vehicle_type, full_refit=False):
+    """Generate forecast and save to MySQL database"""
+    try:
+        # Train the model
+        model, history_df = train_model(history, station_name, vehicle_type, full_refit)
+
+        result = predict_next(model, history_df)
         print("Forecasting completed")
-        
+
         # Save to MySQL database
-        save_forecast_to_mysql(result)
-        
+        save_forecast_to_mysql(result, station_name, vehicle_type)
+
         return result
-        
+
     except Exception as e:
         print(f"Error in forecast_parking: {e}")
         raise
 
-def save_forecast_to_mysql(predictions):
+def predict_parking(history, station_name, vehicle_type):
+    """Forecast from the latest observations with the stored model, without training, and save to MySQL"""
+    try:
+        with timed(TRAINING_PHASE_SECONDS, phase="load_model", engine="neuralprophet"):
+            model, _ = model_store.load_model(station_name, vehicle_type)
+        if model is None:
+            raise RuntimeError("no stored model, run a training pass first")
+
+        history_df = prepare_series(history, station_name, vehicle_type)
+        result = predict_next(model, history_df)
+        print(f"{station_name} - {vehicle_type} Predicted from stored model")
+
+        # Save to MySQL database
+        save_forecast_to_mysql(result, station_name, vehicle_type)
+
+        return result
+
+    except Exception as e:
+        print(f"Error in predict_parking: {e}")
+        raise
+
+def save_forecast_to_mysql(predictions, station_name, vehicle_type):
     """Save forecast results to MySQL database"""
+    with timed(TRAINING_PHASE_SECONDS, phase="save", engine="all"):
+        _save_forecast(predictions, station_name, vehicle_type)
+
+def _save_forecast(predictions, station_name, vehicle_type):
+    connection = None
     try:
         connection = get_db_connection()
         cursor = connection.cursor()
-        
+
         # Current IST timestamp
         now_ist = datetime.now(ZoneInfo("Asia/Kolkata")).replace(microsecond=0).replace(tzinfo=None)
-        
+
         # Insert into forecast_batches table
         insert_batch_query = """
         INSERT INTO forecast_batches (station_name, vehicle_type, timestamp)
         VALUES (%s, %s, %s)
         """
-        
+
         batch_data = (station_name, vehicle_type, now_ist)
         cursor.execute(insert_batch_query, batch_data)
-        
+
         # Get the inserted batch ID
         batch_id = cursor.lastrowid
-        
+
         # Prepare data for forecast table
         forecast_records = []
         for prediction in predictions:
@@ -159,24 +300,35 @@ def save_forecast_to_mysql(predictions):
                 prediction["timestamp"],
                 prediction["predicted_availability"]
             ))
-        
+
         # Insert into forecast table
         insert_forecast_query = """
         INSERT INTO forecast (batch_id, timestamp, predicted_availability)
         VALUES (%s, %s, %s)
         """
-        
+
         cursor.executemany(insert_forecast_query, forecast_records)
-        
+
+        # Point the API at the new batch in the same transaction, so readers never see a half-written one
+        update_pointer_query = """
+        INSERT INTO latest_forecast_batch (station_name, vehicle_type, batch_id, timestamp)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            batch_id = IF(VALUES(timestamp) >= timestamp, VALUES(batch_id), batch_id),
+            timestamp = GREATEST(timestamp, VALUES(timestamp))
+        """
+
+        cursor.execute(update_pointer_query, (station_name, vehicle_type, batch_id, now_ist))
+
         # Commit the transaction
         connection.commit()
-        
+
         print(f"Data inserted in MySQL - Batch ID: {batch_id}")
         print(f"Inserted {len(forecast_records)} forecast records")
-        
+
         cursor.close()
         connection.close()
-        
+
     except mysql.connector.Error as e:
         print(f"MySQL Error in save_forecast_to_mysql: {e}")
         if connection:
@@ -188,15 +340,202 @@ def save_forecast_to_mysql(predictions):
             connection.rollback()
         raise
 
+class JobTimeout(Exception):
+    """Raised inside a worker when a training job exceeds its timeout"""
+
+def _raise_job_timeout(signum, frame):
+    raise JobTimeout("training job timed out")
+
+# History shared with the worker processes, set once per worker by _init_worker
+_worker_history = None
+
+def _init_worker(history, torch_threads):
+    """Pool initializer: keep the history and cap torch threads so workers don't oversubscribe the CPU"""
+    global _worker_history
+    _worker_history = history
+
+    import torch
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed once parallel work has started in this process
+        pass
+
+    signal.signal(signal.SIGALRM, _raise_job_timeout)
+
+def _run_job(station_name, vehicle_type, timeout, full_refit=False, mode="train"):
+    """Forecast one (station, vehicle type) pair, interrupted after timeout seconds"""
+    signal.alarm(timeout)
+    try:
+        if mode == "predict":
+            forecast = predict_parking(_worker_history, station_name, vehicle_type)
+        else:
+            forecast = forecast_parking(_worker_history, station_name, vehicle_type, full_refit)
+    finally:
+        signal.alarm(0)
+
+    print(f"\nForecast for {station_name} ({vehicle_type}):")
+    for entry in forecast:
+        print(f"Timestamp: {entry['timestamp']}, Predicted Availability: {entry['predicted_availability']}")
+    return forecast
+
+def _run_pooled_job(*args):
+    """_run_job in a pool worker, returning its metrics for the parent to record and the error it raised, if any"""
+    with metrics.recording() as recorded:
+        try:
+            _run_job(*args)
+        except Exception as e:
+            # Returned rather than raised, so the timings of a failed job are not lost with it
+            return recorded, e
+    return recorded, None
+
+def run_engine(engine_name, history, jobs, mode="train"):
+    """Forecast every job assigned to an in-process engine in one call and save each batch"""
+    try:
+        engine_class = ENGINES[engine_name]
+    except KeyError:
+        print(f"Unknown forecasting engine: {engine_name}")
+        return [(station_name, vehicle_type, f"unknown engine {engine_name!r}") for station_name, vehicle_type in jobs]
+
+    try:
+        engine = engine_class()
+        series = {(station_name, vehicle_type): prepare_series(history, station_name, vehicle_type)
+                  for station_name, vehicle_type in jobs}
+        with timed(TRAINING_PHASE_SECONDS, phase="forecast", engine=engine_name):
+            forecasts = engine.predict(series, periods) if mode == "predict" else engine.forecast(series, periods)
+    except Exception as e:
+        print(f"Error in {engine_name} engine: {e!r}")
+        return [(station_name, vehicle_type, repr(e)) for station_name, vehicle_type in jobs]
+
+    failed = []
+    for station_name, vehicle_type in jobs:
+        try:
+            forecast = forecasts.get((station_name, vehicle_type))
+            if not forecast:
+                raise RuntimeError("no observations to forecast from")
+            save_forecast_to_mysql(forecast, station_name, vehicle_type)
+            print(f"{station_name} - {vehicle_type} Forecast with the {engine_name} engine")
+        except Exception as e:
+            print(f"Failed for station: '{station_name}', vehicle: {vehicle_type}: {e}")
+            failed.append((station_name, vehicle_type, repr(e)))
+    return failed
+
+def run_batch(jobs, workers=TRAIN_WORKERS, torch_threads=TRAIN_TORCH_THREADS, timeout=TRAIN_JOB_TIMEOUT,
+              use_cache=USE_HISTORY_CACHE, full_refit=False, mode="train", engine=None):
+    """
+    Load the history once and forecast every (station, vehicle type) job, with the
+    in-process engines (NumPy profile, global model) in one call each and per-series
+    NeuralProphet on a bounded process pool, training
+    first in "train" mode or reusing the stored models in "predict" mode
+    """
+    with timed(TRAINING_PHASE_SECONDS, phase="load_history", engine="all"):
+        history = load_history(sorted({station for station, _ in jobs}), sorted({vehicle for _, vehicle in jobs}), use_cache)
+    failed = []
+
+    # Split the jobs by the engine selected for each station
+    config = load_engine_config()
+    by_engine = {}
+    for station_name, vehicle_type in jobs:
+        by_engine.setdefault(engine_for(station_name, vehicle_type, config, engine), []).append((station_name, vehicle_type))
+    prophet_jobs = by_engine.pop("neuralprophet", [])
+
+    if prophet_jobs:
+        failed += run_prophet_jobs(history, prophet_jobs, workers, torch_threads, timeout, full_refit, mode)
+
+    # After the pool, so the global engine's torch import is never inherited by forked workers
+    for engine_name, engine_jobs in by_engine.items():
+        print(f"Running {len(engine_jobs)} jobs with the {engine_name} engine")
+        failed += run_engine(engine_name, history, engine_jobs, mode)
+
+    print(f"Completed {len(jobs) - len(failed)}/{len(jobs)} forecasts")
+    return failed
+
+def run_prophet_jobs(history, prophet_jobs, workers, torch_threads, timeout, full_refit, mode):
+    """Per-series NeuralProphet jobs, inline or on a process pool; returns the failed jobs"""
+    failed = []
+    workers = max(1, min(workers, len(prophet_jobs)))
+    torch_threads = torch_threads or max(1, CPU_COUNT // workers)
+
+    print(f"Running {len(prophet_jobs)} {mode} jobs on {workers} worker(s) with {torch_threads} torch thread(s) each")
+
+    if workers == 1:
+        # Run inline, no point paying for a pool
+        _init_worker(history, torch_threads)
+        for station_name, vehicle_type in prophet_jobs:
+            print(f"Running for station: '{station_name}', vehicle: {vehicle_type} at {datetime.now()}")
+            try:
+                _run_job(station_name, vehicle_type, timeout, full_refit, mode)
+            except Exception as e:
+                print(f"Failed for station: '{station_name}', vehicle: {vehicle_type}: {e}")
+                failed.append((station_name, vehicle_type, repr(e)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(history, torch_threads)) as pool:
+            futures = {
+                pool.submit(_run_pooled_job, station_name, vehicle_type, timeout, full_refit, mode): (station_name, vehicle_type)
+                for station_name, vehicle_type in prophet_jobs
+            }
+            for future in as_completed(futures):
+                station_name, vehicle_type = futures[future]
+                try:
+                    recorded, error = future.result()
+                    metrics.replay(recorded)
+                    if error is not None:
+                        raise error
+                except Exception as e:
+                    print(f"Failed for station: '{station_name}', vehicle: {vehicle_type}: {e}")
+                    failed.append((station_name, vehicle_type, repr(e)))
+    return failed
+
+def parse_args():
+    """Parse the stations and vehicle types to train, defaulting to every station and both vehicle types"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["train", "predict"], default="train", help="train: fit and forecast, predict: forecast with the stored models only")
+    parser.add_argument("--engine", choices=["neuralprophet", *ENGINES], help="Use this engine for every station instead of ENGINE_CONFIG")
+    parser.add_argument("--station", type=str, action="append", help="Station name (repeatable, defaults to all stations)")
+    parser.add_argument("--vehicle", type=int, action="append", help="Vehicle type (0 for twoWheeler, 1 for threeNFourWheeler, repeatable, defaults to both)", choices=[0, 1])
+    parser.add_argument("--workers", type=int, default=TRAIN_WORKERS, help="Number of training processes")
+    parser.add_argument("--torch-threads", type=int, default=TRAIN_TORCH_THREADS, help="Torch threads per worker (0 splits the cores evenly)")
+    parser.add_argument("--timeout", type=int, default=TRAIN_JOB_TIMEOUT, help="Per-job timeout in seconds (0 disables it)")
+    parser.add_argument("--no-cache", action="store_true", help="Read the full history from MySQL instead of the local cache")
+    parser.add_argument("--rebuild-cache", action="store_true", help="Drop the local history cache before loading")
+    parser.add_argument("--full-refit", action="store_true", help="Fit every model from scratch instead of fine-tuning the stored ones")
+    parser.add_argument("--lock-timeout", type=float, help="Seconds to wait for a running forecast run to finish (default: wait forever, 0: give up at once)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+    stations = args.station or STATIONS
+    vehicles = args.vehicle or list(VEHICLE_TYPES)
+    jobs = [(station, VEHICLE_TYPES[vehicle]) for station in stations for vehicle in vehicles]
+
+    started = time.time()
     try:
-        # Generate forecast
-        forecast = forecast_parking()
-        
-        print(f"\nForecast for {station_name} ({vehicle_type}):")
-        for entry in forecast:
-            print(f"Timestamp: {entry['timestamp']}, Predicted Availability: {entry['predicted_availability']}")
-            
+        # One forecast run at a time: the hourly training and the per-snapshot refreshes share this lock
+        with run_lock(args.lock_timeout):
+            if args.rebuild_cache:
+                history_cache.clear()
+            failed = run_batch(jobs, args.workers, args.torch_threads, args.timeout,
+                               use_cache=USE_HISTORY_CACHE and not args.no_cache, full_refit=args.full_refit, mode=args.mode, engine=args.engine)
+    except RunLockBusy as e:
+        print(f"Skipping {args.mode} run: {e}")
+        exit(LOCK_BUSY_EXIT)
     except Exception as e:
         print(f"Error in main execution: {e}")
-        exit(1)
\ No newline at end of file
+        metrics.TRAINING_JOBS.labels(args.mode, "failed").inc(len(jobs))
+        metrics.write_textfile(f"training_{args.mode}")
+        exit(1)
+
+    metrics.TRAINING_RUN_SECONDS.labels(args.mode).set(time.time() - started)
+    metrics.TRAINING_JOBS.labels(args.mode, "ok").inc(len(jobs) - len(failed))
+    metrics.TRAINING_JOBS.labels(args.mode, "failed").inc(len(failed))
+    if not failed:
+        metrics.TRAINING_LAST_SUCCESS.labels(args.mode).set(time.time())
+    metrics.write_textfile(f"training_{args.mode}")
+
+    if failed:
+        print(f"{len(failed)} job(s) failed:")
+        for station_name, vehicle_type, reason in failed:
+            print(f"  {station_name} ({vehicle_type}): {reason}")
+        exit(1)
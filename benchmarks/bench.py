@@ -0,0 +1,315 @@
+"""
+Reproducible performance benchmarks for the ingest, API and training paths.
+
+Generates synthetic availability history (stations x parking areas x months of
+15-minute snapshots) into a disposable MySQL database, then measures:
+
+  ingest  bulk upsert rows/s, rollup backfill time, and per-snapshot
+          upsert + rollup latency (the fetch_parking.py write path)
+  api     throughput and p50/p90/p99 latency of /forecast and /available
+          under concurrent load, against a uvicorn started on that database
+  train   per-station train_model() fit time and peak RSS, one fresh process
+          per run, for each history length in --train-days
+
+and writes one JSON document, e.g.
+
+    python benchmarks/bench.py --database parking_bench --stations 40 --areas 3 --months 3 \\
+        --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/bench.py --database parking_bench --reuse --only api --baseline benchmarks/results/abc123.json
+
+The connection settings come from the usual DB_* variables; only the database
+name is replaced, and it must contain "bench" because its tables are dropped.
+Install benchmarks/requirements.txt first, it adds the load test client.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402
+from loadtest import run as run_load  # noqa: E402
+
+SEED = 20240101
+
+def use_database(name):
+    """Point every app module imported afterwards at the benchmark database"""
+    os.environ["DB_NAME"] = name
+    os.environ["HISTORY_CACHE"] = "0"
+    # rollup.backfill() clears the history cache; keep it away from the real one
+    os.environ["HISTORY_CACHE_DIR"] = tempfile.mkdtemp(prefix="bench-history-")
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=APP_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def station_names(count):
+    from stations import STATIONS
+    return STATIONS[:count] + [f"Synthetic Station {i}" for i in range(len(STATIONS), count)]
+
+def synthetic_day(day, stations, areas, rng):
+    """One day of availability rows: a daily occupancy curve per parking area, with noise"""
+    slots = np.arange(96)
+    # Busiest around 10:00 and 19:00
+    load = 0.5 + 0.35 * np.exp(-((slots - 40) / 10) ** 2) + 0.3 * np.exp(-((slots - 76) / 8) ** 2)
+    rows = []
+    for station in stations:
+        for area in range(areas):
+            two_capacity, four_capacity = int(rng.integers(50, 400)), int(rng.integers(20, 150))
+            occupancy = np.clip(load + rng.normal(0, 0.05, 96), 0, 1)
+            two_occupied = (occupancy * two_capacity).astype(int)
+            four_occupied = (occupancy * four_capacity).astype(int)
+            for slot in slots:
+                rows.append((day + timedelta(minutes=15 * int(slot)), station, f"Parking Area {area + 1}",
+                             two_capacity, four_capacity, int(two_occupied[slot]), int(four_occupied[slot]),
+                             two_capacity - int(two_occupied[slot]), four_capacity - int(four_occupied[slot])))
+    return rows
+
+def reset_database(name):
+    import mysql.connector
+    from db import DB_CONFIG
+    connection = mysql.connector.connect(**{key: value for key, value in DB_CONFIG.items() if key != "database"})
+    cursor = connection.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    cursor.execute(f"CREATE DATABASE `{name}`")
+    connection.commit()
+    connection.close()
+
+def bench_ingest(stations, areas, months, snapshots):
+    """Load the synthetic history through upsert_rows, backfill the rollups, then time single snapshots"""
+    import mysql.connector
+    from db import DB_CONFIG
+    from fetch_parking import COLUMNS
+    from ingest import upsert_rows
+    from migrations import migrate
+    from rollup import backfill, rollup_snapshot
+
+    connection = mysql.connector.connect(**DB_CONFIG)
+    migrate(connection)
+
+    rng = np.random.default_rng(SEED)
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=int(months * 30))
+    rows_written = 0
+    upsert_seconds = 0.0
+    day = start
+    while day < end:
+        rows = synthetic_day(day, stations, areas, rng)
+        started = time.perf_counter()
+        written, _ = upsert_rows(connection, "availability", COLUMNS, rows)
+        upsert_seconds += time.perf_counter() - started
+        rows_written += written
+        day += timedelta(days=1)
+
+    started = time.perf_counter()
+    backfill(connection)
+    backfill_seconds = time.perf_counter() - started
+
+    # The fetch_parking.py write path: one snapshot upserted, then rolled up
+    latencies = []
+    today = synthetic_day(end, stations, areas, rng)
+    cursor = connection.cursor()
+    for i in range(snapshots):
+        timestamp = end + timedelta(minutes=15 * i)
+        snapshot = [(timestamp, *row[1:]) for row in today[i % 96::96]]
+        started = time.perf_counter()
+        upsert_rows(connection, "availability", COLUMNS, snapshot, commit=False)
+        rollup_snapshot(cursor, timestamp)
+        connection.commit()
+        latencies.append(time.perf_counter() - started)
+    cursor.close()
+    connection.close()
+
+    latencies.sort()
+    return {
+        "history_rows": rows_written,
+        "upsert_rows_per_s": round(rows_written / upsert_seconds, 1) if upsert_seconds else None,
+        "upsert_s": round(upsert_seconds, 3),
+        "rollup_backfill_s": round(backfill_seconds, 3),
+        "snapshot_rows": len(stations) * areas,
+        "snapshot_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        } if latencies else None,
+    }
+
+def seed_forecasts(stations):
+    """One forecast batch per (station, vehicle type), so /forecast has something to serve"""
+    from stations import VEHICLE_TYPES
+    from trainAndUpdatePred import save_forecast_to_mysql, periods
+
+    start = datetime.now().replace(second=0, microsecond=0)
+    for station in stations:
+        for vehicle in VEHICLE_TYPES.values():
+            predictions = [{"timestamp": str(start + timedelta(minutes=15 * (i + 1))), "predicted_availability": 42.0}
+                           for i in range(periods)]
+            save_forecast_to_mysql(predictions, station, vehicle)
+
+def wait_for_server(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def bench_api(stations, port, concurrency, requests, available_days):
+    """Start the API on the benchmark database and load-test each endpoint"""
+    seed_forecasts(stations)
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=APP_DIR, env=os.environ.copy())
+    try:
+        if not wait_for_server(url + "/"):
+            raise RuntimeError("API did not start")
+        results = [asyncio.run(run_load(url, "forecast", concurrency, requests, stations, 1))]
+        for days in available_days:
+            result = asyncio.run(run_load(url, "available", concurrency, requests, stations, days))
+            results.append({**result, "days": days})
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+def train_one(station, vehicle, days):
+    """Run in a fresh process: full fit of one station on its last `days` days. Prints one JSON line"""
+    from trainAndUpdatePred import load_history, train_model
+
+    started = time.perf_counter()
+    history = load_history([station], [vehicle], use_cache=False)
+    history = history[history['timestamp'] >= history['timestamp'].max() - timedelta(days=days)]
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    train_model(history, station, vehicle, full_refit=True)
+    fit_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "station": station, "vehicle": vehicle, "days": days, "history_rows": len(history),
+        "load_s": round(load_seconds, 3), "fit_s": round(fit_seconds, 3),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+def bench_train(stations, train_days):
+    """Time train_model() for each station and history length, each in its own process so peak RSS is its own"""
+    from stations import VEHICLE_TYPES
+
+    model_dir = tempfile.mkdtemp(prefix="bench-models-")
+    env = {**os.environ, "MODEL_DIR": model_dir, "WARM_START": "0"}
+    results = []
+    try:
+        for days in train_days:
+            for station in stations:
+                completed = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--train-one", station, VEHICLE_TYPES[0], str(days)],
+                    env=env, capture_output=True, text=True)
+                lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+                if completed.returncode or not lines:
+                    results.append({"station": station, "days": days, "error": completed.stderr.strip().splitlines()[-1:]})
+                else:
+                    results.append(json.loads(lines[-1]))
+    finally:
+        shutil.rmtree(model_dir, ignore_errors=True)
+    return results
+
+def compare(result, baseline):
+    """Print the headline numbers next to a baseline run"""
+    def headline(doc):
+        values = {}
+        ingest = doc.get("ingest") or {}
+        values["ingest upsert rows/s"] = ingest.get("upsert_rows_per_s")
+        values["ingest snapshot p50 ms"] = (ingest.get("snapshot_ms") or {}).get("p50")
+        for entry in doc.get("api") or []:
+            name = f"/{entry['endpoint']}" + (f" {entry['days']}d" if "days" in entry else "")
+            values[f"{name} req/s"] = entry["throughput_rps"]
+            values[f"{name} p99 ms"] = entry["latency_ms"]["p99"]
+        fits = [entry["fit_s"] for entry in doc.get("train") or [] if "fit_s" in entry]
+        values["train mean fit s"] = round(float(np.mean(fits)), 3) if fits else None
+        return values
+
+    current, previous = headline(result), headline(baseline)
+    print(f"\n{'Metric':<32} {'Baseline':>12} {'Current':>12} {'Change':>8}")
+    for name, value in current.items():
+        before = previous.get(name)
+        change = f"{(value - before) / before * 100:+.1f}%" if value is not None and before else ""
+        print(f"{name:<32} {before if before is not None else '-':>12} {value if value is not None else '-':>12} {change:>8}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default="parking_bench", help="Disposable MySQL database, recreated unless --reuse")
+    parser.add_argument("--reuse", action="store_true", help="Keep the data of a previous run instead of regenerating it")
+    parser.add_argument("--only", default="ingest,api,train", help="Comma-separated benchmarks to run")
+    parser.add_argument("--stations", type=int, default=40, help="Stations in the synthetic history")
+    parser.add_argument("--areas", type=int, default=3, help="Parking areas per station")
+    parser.add_argument("--months", type=float, default=1, help="Months of 15-minute snapshots")
+    parser.add_argument("--snapshots", type=int, default=50, help="Single snapshots timed after the bulk load")
+    parser.add_argument("--port", type=int, default=5099, help="Port of the API started for the load test")
+    parser.add_argument("--concurrency", type=int, default=50, help="API requests in flight at once")
+    parser.add_argument("--requests", type=int, default=1000, help="API requests per endpoint")
+    parser.add_argument("--available-days", default="1,30", help="Comma-separated /available ranges in days")
+    parser.add_argument("--train-stations", type=int, default=3, help="Stations timed in the training benchmark")
+    parser.add_argument("--train-days", default="7,30", help="Comma-separated history lengths (days) trained on")
+    parser.add_argument("--output", help="Write the JSON result to this file instead of stdout")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--train-one", nargs=3, metavar=("STATION", "VEHICLE", "DAYS"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if "bench" not in args.database:
+        raise SystemExit(f"Refusing to use {args.database!r}: the benchmark database name must contain 'bench'")
+    use_database(args.database)
+
+    if args.train_one:
+        station, vehicle, days = args.train_one
+        train_one(station, vehicle, float(days))
+        sys.exit(0)
+
+    only = set(args.only.split(","))
+    stations = station_names(args.stations)
+    result = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "host": {"python": platform.python_version(), "cpus": os.cpu_count(), "machine": platform.machine()},
+        "scale": {"stations": args.stations, "areas": args.areas, "months": args.months},
+    }
+
+    if not args.reuse:
+        reset_database(args.database)
+    if "ingest" in only or not args.reuse:
+        result["ingest"] = bench_ingest(stations, args.areas, args.months, args.snapshots)
+    if "api" in only:
+        result["api"] = bench_api(stations, args.port, args.concurrency, args.requests,
+                                  [int(days) for days in args.available_days.split(",")])
+    if "train" in only:
+        result["train"] = bench_train(stations[:args.train_stations], [float(days) for days in args.train_days.split(",")])
+
+    document = json.dumps(result, indent=2, default=str)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(document)
+        print(f"Results written to {args.output}")
+    else:
+        print(document)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(result, json.load(f))
@@ -0,0 +1,102 @@
+"""
+Concurrent load test for the parking forecast API.
+
+Fires --requests calls at --concurrency in flight against /forecast or
+/available and reports throughput and latency percentiles, e.g.
+
+    python benchmarks/loadtest.py --url http://localhost:5001 --endpoint forecast --concurrency 200
+
+Run it against the server before and after a change to compare throughput.
+The benchmarks need their own requirements: pip install -r benchmarks/requirements.txt
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import httpx
+
+DEFAULT_STATIONS = ["Guindy", "Koyambedu", "Egmore", "Vadapalani", "LIC"]
+
+def build_payload(endpoint, stations, i, days):
+    """Request body for the i-th call, cycling through the stations and vehicle types"""
+    station = stations[i % len(stations)]
+    vehicle = (i // len(stations)) % 2
+    if endpoint == "forecast":
+        return {"station_name": station, "vehicle_type": vehicle}
+    return {"stations": [{"station_name": station, "vehicle_type": vehicle}], "days": days}
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def run(url, endpoint, concurrency, total, stations, days):
+    """Issue total requests with at most concurrency in flight and collect per-request latencies"""
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"/{endpoint}", json=build_payload(endpoint, stations, i, days))
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p90": round(percentile(latencies, 90) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001", help="Base URL of the API")
+    parser.add_argument("--endpoint", choices=["forecast", "available"], default="forecast")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight at once")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests to send")
+    parser.add_argument("--station", action="append", help="Station to query (repeatable)")
+    parser.add_argument("--days", type=int, default=1, help="Days of history for /available")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON only")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(run(args.url, args.endpoint, args.concurrency, args.requests,
+                             args.station or DEFAULT_STATIONS, args.days))
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"{result['requests']} x /{result['endpoint']} at concurrency {result['concurrency']}: "
+              f"{result['throughput_rps']} req/s, {result['errors']} errors")
+        latency = result["latency_ms"]
+        print(f"latency ms  mean {latency['mean']}  p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}")
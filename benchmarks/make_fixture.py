@@ -0,0 +1,79 @@
+"""
+Export a slice of the MySQL tables into an offline fixture for app/backtest.py.
+
+Copies the station_availability rollup and the forecast batches, hot and
+archived, of the last --days days, for all or some stations, into a SQLite
+file or a directory of CSV files, e.g.
+
+    python benchmarks/make_fixture.py --days 28 --sqlite fixtures/parking.db
+    python app/backtest.py --mode configs --sqlite fixtures/parking.db --station Guindy
+
+The fixture holds only what the backtests read, so it can be shared and rerun
+without database access.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import mysql.connector
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from db import DB_CONFIG  # noqa: E402
+from rollup import ROLLUP_TABLE  # noqa: E402
+
+def export_tables(connection, since, stations=None):
+    """station_availability, forecast_batches, forecast and forecast_archive rows from `since`, optionally for some stations only"""
+    station_filter, params = "", [since]
+    if stations:
+        station_filter = f"AND {{column}} IN ({', '.join(['%s'] * len(stations))})"
+        params += stations
+
+    availability = pd.read_sql(
+        f"SELECT * FROM {ROLLUP_TABLE} WHERE timestamp >= %s {station_filter.format(column='stationName')} ORDER BY timestamp",
+        connection, params=params)
+    batches = pd.read_sql(
+        f"SELECT id, station_name, vehicle_type, timestamp FROM forecast_batches "
+        f"WHERE timestamp >= %s {station_filter.format(column='station_name')}",
+        connection, params=params)
+    forecasts = pd.read_sql(
+        f"SELECT f.batch_id, f.timestamp, f.predicted_availability FROM forecast f "
+        f"JOIN forecast_batches fb ON fb.id = f.batch_id WHERE fb.timestamp >= %s {station_filter.format(column='fb.station_name')}",
+        connection, params=params)
+    # Batches older than FORECAST_RETENTION_DAYS only survive in the archive
+    archive = pd.read_sql(
+        f"SELECT * FROM forecast_archive WHERE batch_hour >= %s {station_filter.format(column='station_name')}",
+        connection, params=params)
+    return {ROLLUP_TABLE: availability, "forecast_batches": batches, "forecast": forecasts, "forecast_archive": archive}
+
+def write_fixture(tables, sqlite_path=None, csv_dir=None):
+    if sqlite_path:
+        os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+        with sqlite3.connect(sqlite_path) as connection:
+            for name, df in tables.items():
+                df.to_sql(name, connection, if_exists="replace", index=False)
+    else:
+        os.makedirs(csv_dir, exist_ok=True)
+        for name, df in tables.items():
+            df.to_csv(os.path.join(csv_dir, f"{name}.csv"), index=False)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an offline backtest fixture from MySQL")
+    parser.add_argument("--days", type=float, default=28, help="Days of history and forecast batches to export")
+    parser.add_argument("--station", action="append", help="Station name (repeatable, defaults to all stations)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--sqlite", help="Write the fixture to this SQLite file")
+    target.add_argument("--csv", help="Write the fixture as CSV files into this directory")
+    args = parser.parse_args()
+
+    since = datetime.now(ZoneInfo("Asia/Kolkata")).replace(tzinfo=None) - timedelta(days=args.days)
+    connection = mysql.connector.connect(**DB_CONFIG)
+    tables = export_tables(connection, since, args.station)
+    connection.close()
+
+    write_fixture(tables, args.sqlite, args.csv)
+    for name, df in tables.items():
+        print(f"{name}: {len(df)} rows")
+    print(f"Fixture written to {args.sqlite or args.csv}")
@@ -2,7 +2,28 @@
 
 printenv | grep -vE "^(HOME|PATH|PWD|SHLVL|_)=.*" > /app/.env
 
+# Bring the schema up to date before anything reads or writes it: the collectors commit every snapshot
+# together with its rollup, and forecasts are saved and served through latest_forecast_batch.
+# Every migration is idempotent; retried while the database is still starting up
+for attempt in 1 2 3 4 5; do
+    python -u migrations.py --no-explain && break
+    echo "$(date) migrations.py failed (attempt $attempt), retrying in 10s"
+    sleep 10
+done
+
 cron
 # Optional: wait a moment to ensure cron starts
 sleep 1
+
+# Resident parking and passenger collectors, with warm HTTP sessions and DB connections,
+# restarted whenever they exit so ingestion never stops while the API keeps running
+(
+    while true; do
+        python -u ingest_daemon.py >> /var/log/cron.log 2>&1
+        status=$?
+        echo "$(date) ingest_daemon.py exited with status $status, restarting in 10s" >> /var/log/cron.log
+        sleep 10
+    done
+) &
+
 uvicorn server:app --host 0.0.0.0 --port 5001
\ No newline at end of file
@@ -0,0 +1,52 @@
+import math
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+from forecasters import PROFILE_WEEKS, ProfileForecaster  # noqa: E402
+
+def make_series(start, end, level=50.0):
+    ds = pd.date_range(start, end, freq="15min")
+    slot = np.arange(len(ds)) % 96
+    return pd.DataFrame({"ds": ds, "y": level + 10 * np.sin(2 * np.pi * slot / 96)})
+
+def test_forecasts_every_step_after_the_last_observation():
+    series = {("Guindy", "twoWheelerAvailable"): make_series("2024-01-01", "2024-01-29 12:00")}
+    result = ProfileForecaster(persist=False).forecast(series, 6)
+
+    forecast = result[("Guindy", "twoWheelerAvailable")]
+    assert [entry["timestamp"] for entry in forecast] == [
+        f"2024-01-29 {hour}:{minute}:00" for hour, minute in
+        [("12", "15"), ("12", "30"), ("12", "45"), ("13", "00"), ("13", "15"), ("13", "30")]
+    ]
+    assert all(math.isfinite(entry["predicted_availability"]) for entry in forecast)
+
+def test_series_silent_for_the_whole_window_is_skipped():
+    end = pd.Timestamp("2024-03-01 12:00")
+    silent_until = end - pd.Timedelta(weeks=PROFILE_WEEKS + 1)
+    series = {
+        ("Guindy", "twoWheelerAvailable"): make_series(end - pd.Timedelta(weeks=2), end),
+        ("LIC", "twoWheelerAvailable"): make_series(silent_until - pd.Timedelta(weeks=2), silent_until),
+    }
+    result = ProfileForecaster(persist=False).forecast(series, 6)
+
+    assert list(result) == [("Guindy", "twoWheelerAvailable")]
+    assert all(math.isfinite(entry["predicted_availability"]) for entry in result[("Guindy", "twoWheelerAvailable")])
+
+def test_stale_series_forecasts_from_its_own_last_observation():
+    end = pd.Timestamp("2024-03-01 12:00")
+    series = {
+        ("Guindy", "twoWheelerAvailable"): make_series(end - pd.Timedelta(weeks=2), end),
+        ("LIC", "twoWheelerAvailable"): make_series(end - pd.Timedelta(weeks=2), end - pd.Timedelta(days=1)),
+    }
+    result = ProfileForecaster(persist=False).forecast(series, 2)
+
+    assert [entry["timestamp"] for entry in result[("LIC", "twoWheelerAvailable")]] == [
+        "2024-02-29 12:15:00", "2024-02-29 12:30:00"
+    ]
+
+def test_only_silent_series_gives_no_forecasts():
+    series = {("LIC", "twoWheelerAvailable"): pd.DataFrame({"ds": pd.to_datetime(["2024-01-01"]), "y": [np.nan]})}
+    assert ProfileForecaster(persist=False).forecast(series, 6) == {}